@@ -1,112 +1,205 @@
-import polib
-import subprocess
+import argparse
+import hashlib
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+
+import polib
 from translate.storage import tmx
 
 # Paths to your original po files
 PO1 = Path("gnome-ui.po")
 PO2 = Path("gnome-docs.po")
 
-# Output smaller po files
-SMALL1 = Path("intermediate/gnome-ui-small.po")
-SMALL2 = Path("intermediate/gnome-docs-small.po")
-
-# Output tmx files
+# Translation errors reviewed by humans
 TMX0 = Path("errors.tmx")
-TMX1 = Path("intermediate/file1.tmx")
-TMX2 = Path("intermediate/file2.tmx")
-MERGED_TMX = Path("merged.tmx")
 
-# Step 1: Read and truncate PO files
+# Parsed catalogs, keyed by the hash of the PO file
+CACHE_DIR = Path("intermediate/cache")
 
+DATASET_SIZE = 1000
+ENTRIES_PER_CATALOG = 500
 
-def truncate_po(src: Path, dst: Path, limit: int = 500):
-    po = polib.pofile(src)
-    new_po = polib.POFile()
+# Step 1: Read the PO files
 
-    # Copy metadata
-    new_po.metadata = po.metadata
 
-    total_entries = len(po)
-    if total_entries <= limit:
-        # If fewer than limit, just copy everything
-        selected_entries = po
-    else:
-        step = total_entries / limit
-        selected_entries = [po[int(i * step)] for i in range(limit)]
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    for entry in selected_entries:
-        new_po.append(entry)
 
-    new_po.save(dst)
+def parse_po(src: Path) -> list:
+    """[source, target, usable] of every entry of a PO file, in file order.
 
+    Usable entries are the ones po2tmx converts: translated and not fuzzy.
+    """
+    entries = []
+    for entry in polib.pofile(str(src)):
+        if entry.msgid_plural:
+            target = entry.msgstr_plural.get(0, "")
+        else:
+            target = entry.msgstr
+        entries.append([entry.msgid, target, entry.translated()])
+    return entries
 
-def save_po(tmx):
-    po = polib.POFile()
-    po.metadata = {
-        "Project-Id-Version": "merged-tmx",
-        "Language": "ca",
-        "Content-Type": "text/plain; charset=UTF-8",
-    }
 
-    for unit in tmx.units:
-        # Convert TMX unit -> POEntry
-        entry = polib.POEntry(
-            msgid=unit.source or "",
-            msgstr=unit.target or "",
-        )
-        po.append(entry)
-    output_file = "dataset.po"
-    po.save(output_file)
-    print(f"Saved {output_file}")
+def cached_parse(src: Path, digest: str) -> list:
+    cache = CACHE_DIR / f"{src.stem}-{digest[:16]}.json"
+    if cache.exists():
+        with open(cache, "r", encoding="utf-8") as f:
+            return json.load(f)
+    entries = parse_po(src)
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    return entries
+
+
+def load_catalogs(paths: list) -> list:
+    """Parse the catalogs in parallel, reusing the cache of unchanged files."""
+    digests = [file_hash(path) for path in paths]
+    with ProcessPoolExecutor(len(paths)) as executor:
+        return list(executor.map(cached_parse, paths, digests))
+
 
+def load_errors(path: Path) -> list:
+    """(source, target, note) of every unit of the errors TMX."""
+    with open(path, "rb") as f:
+        store = tmx.tmxfile(f, "utf-8")
+    return [(unit.source, unit.target, unit.getnotes()) for unit in store.units]
 
-def merge_tmx(file1, file2, file3, output):
-    # Open files in binary mode
+
+# Step 2: Select the units
+
+
+def stride(entries: list, limit: int) -> list:
+    """`limit` entries evenly spaced over the catalog, then the usable ones."""
+    if len(entries) > limit:
+        step = len(entries) / limit
+        entries = [entries[int(i * step)] for i in range(limit)]
+    return [(source, target, "") for source, target, usable in entries if usable]
+
+
+def merge(errors: list, *catalogs, size: int = None) -> list:
+    """Errors first, then units of the catalogs whose source is not there yet."""
+    units = []
     sources = set()
-    with open(file1, "rb") as f1, open(file2, "rb") as f2, open(file3, "rb") as f3:
-        tmx1 = tmx.tmxfile(f1, "utf-8")
-        tmx2 = tmx.tmxfile(f2, "utf-8")
-        tmx3 = tmx.tmxfile(f3, "utf-8")
-
-        # Merge units from second and third files into the first
-        for unit in tmx1.units:
-            sources.add(unit.source)
-
-        print(f"Defined errors: {len(sources)}")
-
-        for unit in tmx2.units:
-            if unit.source not in sources:
-                tmx1.addunit(unit)
-                sources.add(unit.source)
-            else:
-                print(f"Discard: {unit.source}")
-
-        for unit in tmx3.units:
-            if unit.source not in sources:
-                tmx1.addunit(unit)
-                sources.add(unit.source)
-            else:
-                print(f"Discard: {unit.source}")
-
-            if len(sources) >= 1000:
-                break
-
-    # Save merged TMX
+    print(f"Defined errors: {len(errors)}")
+    for unit in errors:
+        units.append(unit)
+        sources.add(unit[0])
+    for catalog in catalogs:
+        for unit in catalog:
+            if size is not None and len(units) >= size:
+                return units
+            if unit[0] in sources:
+                print(f"Discard: {unit[0]}")
+                continue
+            units.append(unit)
+            sources.add(unit[0])
+    return units
+
+
+def stratified(errors: list, catalogs: list, size: int, error_ratio: float, seed: int = 0) -> list:
+    """A random sample of `size` units with `error_ratio` of errors.
+
+    Correct units are drawn from every catalog in proportion to its number
+    of usable entries. There are few human reviewed errors and every unit is
+    sampled once, so when the ratio asks for more errors than available the
+    sample has all of them and correct units fill the rest.
+    """
+    rng = random.Random(seed)
+    n_errors = round(size * error_ratio)
+    if n_errors > len(errors):
+        print(f"Only {len(errors)} errors available, {n_errors} requested")
+        n_errors = len(errors)
+    picked = rng.sample(errors, n_errors)
+
+    sources = {unit[0] for unit in errors}
+    strata = []
+    for entries in catalogs:
+        usable = {}
+        for source, target, ok in entries:
+            if ok and source not in sources and source not in usable:
+                usable[source] = (source, target, "")
+        strata.append(list(usable.values()))
+        sources.update(usable)
+
+    correct = size - n_errors
+    available = sum(len(stratum) for stratum in strata)
+    if correct > available:
+        raise ValueError(f"Only {available} distinct correct units available, {correct} requested")
+    for i, stratum in enumerate(strata):
+        if i == len(strata) - 1:
+            share = correct - (len(picked) - n_errors)
+        else:
+            share = round(correct * len(stratum) / available) if available else 0
+        picked += rng.sample(stratum, share)
+    rng.shuffle(picked)
+    return picked
+
+
+# Step 3: Save the dataset
+
+
+def save_tmx(units: list, output: Path):
+    store = tmx.tmxfile(sourcelanguage="en", targetlanguage="ca")
+    for source, target, note in units:
+        store.addtranslation(source, "en", target, "ca", note or None)
     with open(output, "wb") as f:
-        tmx1.savefile(f)
-
-    print(f"Merged TMX contains {len(tmx1.units)} segments.")
+        store.savefile(f)
+    print(f"Merged TMX contains {len(store.units)} segments.")
     print(f"TMX saved as {output}")
-    save_po(tmx1)
 
 
-truncate_po(PO1, SMALL1)
-truncate_po(PO2, SMALL2)
+def save_po(units: list, output: Path):
+    po = polib.POFile()
+    po.metadata = {
+        "Project-Id-Version": "merged-tmx",
+        "Language": "ca",
+        "Content-Type": "text/plain; charset=UTF-8",
+    }
 
-# Step 2: Convert smaller PO files to TMX using translate-toolkit (po2tmx)
-subprocess.run(["po2tmx", str(SMALL1), str(TMX1), "-l ca"], check=True)
-subprocess.run(["po2tmx", str(SMALL2), str(TMX2), "-l ca"], check=True)
+    for source, target, note in units:
+        po.append(polib.POEntry(msgid=source or "", msgstr=target or ""))
+    po.save(str(output))
+    print(f"Saved {output}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Build the evaluation dataset.")
+    parser.add_argument(
+        "--size",
+        type=int,
+        help="Build a stratified random sample of this size (e.g. 10000) as dataset-SIZE.tmx "
+        f"instead of the {DATASET_SIZE} units dataset",
+    )
+    parser.add_argument(
+        "--error_ratio",
+        type=float,
+        default=0.05,
+        help="With --size, share of translation errors in the sample",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="With --size, random seed of the sample")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    errors = load_errors(TMX0)
+    ui, docs = load_catalogs([PO1, PO2])
+
+    if args.size:
+        units = stratified(errors, [ui, docs], args.size, args.error_ratio, args.seed)
+        output = Path(f"dataset-{args.size}")
+    else:
+        small = [stride(catalog, ENTRIES_PER_CATALOG) for catalog in (ui, docs)]
+        units = merge(errors, *small, size=DATASET_SIZE)
+        output = Path("dataset")
 
-output = "dataset.tmx"
-merge_tmx(str(TMX0), str(TMX1), str(TMX2), output)
+    save_tmx(units, output.with_suffix(".tmx"))
+    save_po(units, output.with_suffix(".po"))
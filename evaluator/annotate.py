@@ -0,0 +1,62 @@
+import os
+from collections import deque
+
+
+def annotated_path(po_path: str) -> str:
+    return os.path.splitext(po_path)[0] + ".annotated.po"
+
+
+# -------------------------
+# PO annotation
+# -------------------------
+class PoAnnotator:
+    """Write a copy of a PO file with the findings of the review as annotations.
+
+    Every entry read from the input is registered with `add` in file order,
+    and the reviewed ones get their answer with `annotate`. Entries are
+    written as soon as all the entries before them are done, so the copy is
+    produced in the same streaming pass as the review. Only the entries in
+    flight are kept in memory, and the polib entry objects of the input are
+    reused. With `mode` "comment" the finding is added as a translator
+    comment; with "fuzzy" the entry is also flagged as fuzzy.
+    """
+
+    def __init__(self, path: str, mode: str = "comment"):
+        self.path = path
+        self.mode = mode
+        self.fh = open(path, "w", encoding="utf-8")
+        self.window = deque()
+        self.annotated = 0
+
+    def add(self, entry, review: bool = True):
+        """Register the next entry of the input; returns its slot for `annotate`."""
+        slot = [entry, not review]
+        self.window.append(slot)
+        self._flush()
+        return slot
+
+    def annotate(self, slot, answer: str):
+        entry = slot[0]
+        if answer.upper().startswith("YES"):
+            comment = f"Review: {answer.strip()}"
+            entry.tcomment = f"{entry.tcomment}\n{comment}" if entry.tcomment else comment
+            if self.mode == "fuzzy" and "fuzzy" not in entry.flags:
+                entry.flags.append("fuzzy")
+            self.annotated += 1
+        slot[1] = True
+        self._flush()
+
+    def _flush(self):
+        while self.window and self.window[0][1]:
+            entry = self.window.popleft()[0]
+            self.fh.write(str(entry) + "\n")
+
+    def progress(self) -> str:
+        return f"Annotated {self.annotated} entries in {self.path}"
+
+    def close(self):
+        # Entries left without answer (e.g. after --max) are copied unchanged
+        for slot in self.window:
+            slot[1] = True
+        self._flush()
+        self.fh.close()
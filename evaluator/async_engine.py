@@ -0,0 +1,149 @@
+import asyncio
+import random
+import time
+
+# Exceptions of the OpenAI and Google clients that carry no HTTP status
+RETRYABLE_TYPES = {
+    "RateLimitError",
+    "InternalServerError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+}
+
+
+# -------------------------
+# Rate limiting
+# -------------------------
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits. None disables a limit."""
+
+    def __init__(self, rpm: float = None, tpm: float = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    async def acquire(self, tokens: int):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(tokens)
+
+
+def estimate_tokens(messages) -> int:
+    return sum(len(message.content) for message in messages) // 4 + 1
+
+
+# -------------------------
+# Retries
+# -------------------------
+def is_retryable(error: Exception) -> bool:
+    """True for rate limit (429) and server side (5xx) errors.
+
+    The HTTP status of the error is used when there is one, otherwise the
+    type of the error. Errors raised from another one (`raise ... from`),
+    as LangChain wraps the errors of some clients, are checked by their cause.
+    """
+    response = getattr(error, "response", None)
+    for status in [
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(response, "status_code", None),
+    ]:
+        if isinstance(status, int):
+            return status == 429 or 500 <= status < 600
+    if any(cls.__name__ in RETRYABLE_TYPES for cls in type(error).__mro__):
+        return True
+    cause = error.__cause__
+    return cause is not None and is_retryable(cause)
+
+
+async def ainvoke_with_retry(
+    llm,
+    messages,
+    limiter: RateLimiter,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+):
+    """Call llm.ainvoke with exponential backoff and jitter on retryable errors.
+
+    The number of retries used is stored in the response metadata.
+    """
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(estimate_tokens(messages))
+        try:
+            ai_msg = await llm.ainvoke(messages)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * 2**attempt)
+            delay *= 0.5 + random.random() / 2
+            print(f"Retry {attempt + 1}/{max_retries} in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            continue
+        ai_msg.response_metadata["retries"] = attempt
+        return ai_msg
+
+
+# -------------------------
+# Concurrent answerer
+# -------------------------
+def async_answerer(
+    llm,
+    prompt: str,
+    build_messages,
+    read_answer,
+    concurrency: int = 8,
+    limiter: RateLimiter = None,
+    max_retries: int = 5,
+):
+    """Answer a list of pairs with up to `concurrency` requests in flight.
+
+    `build_messages(prompt, english, catalan)` builds the request and
+    `read_answer(english, catalan, ai_msg)` turns the response into the
+    answer text. Answers are returned in the same order as the pairs.
+    """
+    limiter = limiter or RateLimiter()
+    loop = asyncio.new_event_loop()
+
+    async def review_pair(semaphore, pair):
+        async with semaphore:
+            messages = build_messages(prompt, *pair)
+            ai_msg = await ainvoke_with_retry(llm, messages, limiter, max_retries)
+        return read_answer(*pair, ai_msg)
+
+    async def review_pairs(pairs):
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(review_pair(semaphore, pair) for pair in pairs))
+
+    def answer(pairs):
+        return loop.run_until_complete(review_pairs(pairs))
+
+    return answer
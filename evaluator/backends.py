@@ -0,0 +1,148 @@
+import glob
+import multiprocessing
+import os
+
+import yaml
+
+CONFIG_ROOT = "config"
+
+# Keys of backend.yml that are not passed to the model constructor
+RESERVED_KEYS = [
+    "backend",
+    "model_path",
+    "threads",
+    "prompts",
+    "dir",
+    "price_input",
+    "price_output",
+    "draft",
+    "draft_model_path",
+    "draft_tokens",
+]
+
+LLAMACPP_DEFAULTS = {
+    "temperature": 0,
+    "n_ctx": 2048,
+    "n_gpu_layers": 8,
+    "n_batch": 64,
+    "max_tokens": 128,
+    "top_p": 1.0,
+    "repeat_penalty": 1.1,
+    "verbose": False,
+}
+
+BACKENDS = {}
+
+
+def register_backend(name: str):
+    """Register a function that builds a model from its backend.yml entry."""
+
+    def decorator(loader):
+        BACKENDS[name] = loader
+        return loader
+
+    return decorator
+
+
+# -------------------------
+# Configuration
+# -------------------------
+def _model_configs() -> dict:
+    """Read every config/<dir>/backend.yml; each one defines one or more model types."""
+    configs = {}
+    for path in sorted(glob.glob(os.path.join(CONFIG_ROOT, "*", "backend.yml"))):
+        directory = os.path.basename(os.path.dirname(path))
+        with open(path, "r") as fh:
+            for model_type, config in (yaml.safe_load(fh) or {}).items():
+                configs[model_type] = {**config, "dir": directory}
+    return configs
+
+
+def model_types():
+    return sorted(_model_configs())
+
+
+def model_config(model_type: str, **overrides) -> dict:
+    configs = _model_configs()
+    if model_type not in configs:
+        raise ValueError(f"Unsupported model_type: {model_type}")
+    config = dict(configs[model_type])
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+def is_local(model_type: str) -> bool:
+    return model_config(model_type)["backend"] == "llamacpp"
+
+
+def prompt_dir(model_type: str) -> str:
+    config = model_config(model_type)
+    return os.path.join(CONFIG_ROOT, config.get("prompts", config["dir"]))
+
+
+def _model_kwargs(config: dict) -> dict:
+    return {key: value for key, value in config.items() if key not in RESERVED_KEYS}
+
+
+# -------------------------
+# Backends
+# -------------------------
+@register_backend("llamacpp")
+def _load_llamacpp(config: dict, n_threads: int = None):
+    from langchain_community.chat_models import ChatLlamaCpp
+
+    threads = n_threads or config.get("threads") or max(1, multiprocessing.cpu_count())
+    kwargs = {**LLAMACPP_DEFAULTS, **_model_kwargs(config)}
+    if config.get("draft"):
+        if not config.get("draft_model_path"):
+            raise ValueError(f"No draft_model_path in config/{config['dir']}/backend.yml")
+        from draft import SmallModelDraft
+
+        draft = SmallModelDraft(
+            config["draft_model_path"],
+            config.get("draft_tokens", 8),
+            n_ctx=kwargs["n_ctx"],
+            n_batch=kwargs["n_batch"],
+            n_gpu_layers=kwargs["n_gpu_layers"],
+            n_threads=threads,
+        )
+        kwargs["model_kwargs"] = {**kwargs.get("model_kwargs", {}), "draft_model": draft}
+    return ChatLlamaCpp(model_path=config["model_path"], n_threads=threads, **kwargs)
+
+
+@register_backend("openai")
+def _load_openai(config: dict, n_threads: int = None):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**_model_kwargs(config))
+
+
+@register_backend("gemini")
+def _load_gemini(config: dict, n_threads: int = None):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(**_model_kwargs(config))
+
+
+@register_backend("fake")
+def _load_fake(config: dict, n_threads: int = None):
+    from fake_llm import FakeChatModel
+
+    return FakeChatModel(**_model_kwargs(config))
+
+
+def draft_model(llm):
+    """The SmallModelDraft of a loaded llama.cpp model, or None."""
+    client = getattr(llm, "client", None)
+    draft = getattr(client, "draft_model", None)
+    return draft if hasattr(draft, "stats") else None
+
+
+def load_llm(model_type: str, n_threads: int = None, **overrides):
+    """Return a LangChain-compatible LLM configured in config/<dir>/backend.yml.
+
+    Only the library of the selected backend is imported. Keyword arguments
+    override the values of the configuration file.
+    """
+    config = model_config(model_type, **overrides)
+    return BACKENDS[config["backend"]](config, n_threads=n_threads)
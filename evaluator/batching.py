@@ -0,0 +1,80 @@
+import logging
+import re
+
+from langchain.schema import SystemMessage, HumanMessage
+
+BATCH_INSTRUCTIONS = """
+
+You will receive several numbered translations. Review each one independently.
+Answer with exactly one line per translation, in the same order, using this format:
+<number>: YES|NO - <short explanation>
+"""
+
+VERDICT_LINE = re.compile(
+    r"^[ \t*#-]*(?:segment|translation)?[ \t]*(\d+)[ \t*]*[:.)\]-]+[ \t*]*(YES|NO)\b[ \t*:.,-]*(.*)$",
+    flags=re.IGNORECASE | re.MULTILINE,
+)
+
+
+# -------------------------
+# Batched review
+# -------------------------
+def review_mode(batch_size: int) -> str:
+    """Review mode for the verdict cache namespace.
+
+    Batched answers are produced with another prompt and can differ from
+    the single string ones, so they are not reused for each other.
+    """
+    return "batch" + BATCH_INSTRUCTIONS if batch_size > 1 else "single"
+
+
+def build_batch_messages(prompt: str, pairs, clean=None):
+    clean = clean or (lambda text: text)
+    segments = []
+    for number, (english, catalan, *context) in enumerate(pairs, start=1):
+        segment = f"{number}:\nEnglish: '''{clean(english)}'''\nCatalan: '''{clean(catalan)}'''"
+        if context and context[0]:
+            segment += f"\n{context[0]}"
+        segments.append(segment)
+    return [
+        SystemMessage(content=prompt + BATCH_INSTRUCTIONS),
+        HumanMessage(content="\n\n".join(segments)),
+    ]
+
+
+def parse_batch_answer(answer: str, size: int):
+    """Return one 'YES ...'/'NO ...' answer per segment, or None if missing."""
+    answer = re.sub(r"<think>.*?</think>", "", answer, flags=re.DOTALL)
+    verdicts = [None] * size
+    for match in VERDICT_LINE.finditer(answer):
+        number = int(match.group(1))
+        if 1 <= number <= size and verdicts[number - 1] is None:
+            explanation = match.group(3).strip()
+            verdict = match.group(2).upper()
+            verdicts[number - 1] = f"{verdict} - {explanation}" if explanation else verdict
+    return verdicts
+
+
+def batch_answerer(llm, prompt: str, translate, clean=None):
+    """Answer pairs with one request per batch.
+
+    Segments whose verdict cannot be parsed are reviewed again one by one.
+    """
+
+    def answer(pairs):
+        if len(pairs) == 1:
+            return [translate(llm, prompt, *pairs[0])]
+
+        ai_msg = llm.invoke(build_batch_messages(prompt, pairs, clean))
+        content = (ai_msg.content or "").strip()
+        logging.info(f"batch of {len(pairs)}: {content}\n")
+        verdicts = parse_batch_answer(content, len(pairs))
+        missing = verdicts.count(None)
+        if missing:
+            print(f"Batch answer missing {missing} of {len(pairs)} verdicts, retrying them one by one")
+        return [
+            verdict if verdict is not None else translate(llm, prompt, *pair)
+            for verdict, pair in zip(verdicts, pairs)
+        ]
+
+    return answer
@@ -0,0 +1,191 @@
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from xml.sax.saxutils import escape
+
+import evaluator
+import loaders
+import results_store
+import writer
+from fake_llm import FakeChatModel
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(REPO, "dataset", "dataset.tmx")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the review pipeline with an offline fake model."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="10000",
+        help="Comma separated sizes of the synthetic datasets (e.g. 10000,100000,1000000)",
+    )
+    parser.add_argument(
+        "--no_dataset",
+        action="store_true",
+        help="Do not benchmark dataset/dataset.tmx",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per fake model call"
+    )
+    parser.add_argument(
+        "--yes_rate", type=float, default=0.1, help="Share of strings flagged with YES"
+    )
+    parser.add_argument(
+        "--options",
+        type=str,
+        default="",
+        help="Extra evaluator.py options, e.g. '--prefilter --trace'",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Write the results to this JSON file"
+    )
+    return parser.parse_args()
+
+
+# -------------------------
+# Datasets
+# -------------------------
+def write_synthetic_tmx(path: str, size: int):
+    """Write a TMX with `size` units made of unique copies of the dataset units."""
+    units = list(loaders.iter_tmx(DATASET))
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write('<?xml version="1.0" encoding="utf-8"?>\n<tmx version="1.4">\n')
+        fh.write('<header srclang="en" datatype="plaintext"/>\n<body>\n')
+        for number, (source, target, note) in enumerate(
+            itertools.islice(itertools.cycle(units), size)
+        ):
+            suffix = f" ({number})"
+            fh.write("<tu>\n")
+            if note:
+                fh.write(f"<note>{escape(note)}</note>\n")
+            fh.write(f'<tuv xml:lang="en"><seg>{escape(source + suffix)}</seg></tuv>\n')
+            fh.write(f'<tuv xml:lang="ca"><seg>{escape(target + suffix)}</seg></tuv>\n')
+            fh.write("</tu>\n")
+        fh.write("</body>\n</tmx>\n")
+
+
+# -------------------------
+# Stage timers
+# -------------------------
+class Stages:
+    """Accumulated seconds of every stage of the review loop."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def wrap(self, stage: str, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        return timed
+
+    def iterate(self, stage: str, items):
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+
+def _run_case(dataset: str, size: int, args) -> dict:
+    """Run the evaluator loop over `dataset` in a temporary working directory."""
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        os.symlink(os.path.join(REPO, "config"), os.path.join(workdir, "config"))
+        os.makedirs(os.path.join(workdir, "output"))
+        os.chdir(workdir)
+        if dataset is None:
+            dataset = os.path.join(workdir, f"synthetic-{size}.tmx")
+            write_synthetic_tmx(dataset, size)
+
+        options = ["--model_type", "fake", "--no_cache", "--max", str(size)]
+        eval_args = evaluator.get_args(options + args.options.split())
+        llm = FakeChatModel(latency=args.latency, yes_rate=args.yes_rate)
+
+        stages = Stages()
+        evaluator.translate = stages.wrap("translate", evaluator.translate)
+        writer.ResultWriter.write = stages.wrap("write", writer.ResultWriter.write)
+        # write() only queues the findings, close() waits for the thread to write them
+        writer.ResultWriter.close = stages.wrap("write", writer.ResultWriter.close)
+        results_store.Run.add = stages.wrap("store", results_store.Run.add)
+        results_store.Run.finish = stages.wrap("store", results_store.Run.finish)
+        strings = stages.iterate("load_strings", evaluator.load_strings(dataset, size))
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = results_store.connect()
+            record, processed = evaluator.run_evaluation(
+                eval_args, "1", None, strings, llm=llm, store=store
+            )
+            store.close()
+        elapsed = time.perf_counter() - start
+
+        measured = sum(stages.seconds.values())
+        stages.add("loop", max(0.0, elapsed - measured))
+        return {
+            "dataset": "dataset.tmx" if size == -1 else f"synthetic-{size}",
+            "units": processed,
+            "seconds": round(elapsed, 3),
+            "units_per_sec": round(processed / elapsed, 1) if elapsed else 0,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "stages": {stage: round(s, 3) for stage, s in stages.seconds.items()},
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_case(dataset: str, size: int, args) -> dict:
+    """Run one case in a fresh process, so its memory peak is measured alone."""
+    context = multiprocessing.get_context("fork")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(_run_case, dataset, size, args).result()
+
+
+# -------------------------
+# Main
+# -------------------------
+if __name__ == "__main__":
+    args = get_args()
+    cases = [] if args.no_dataset else [(DATASET, -1)]
+    cases += [(None, int(size)) for size in args.sizes.split(",") if size]
+
+    results = []
+    for dataset, size in cases:
+        result = run_case(dataset, size, args)
+        results.append(result)
+        stages = ", ".join(f"{stage}: {s:.2f}s" for stage, s in result["stages"].items())
+        print(
+            f"{result['dataset']}: {result['units']} units in {result['seconds']:.2f}s | "
+            f"units/s: {result['units_per_sec']:.1f} | peak RSS: {result['peak_rss_mb']} MB | "
+            f"{stages}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Results written to {args.output}")
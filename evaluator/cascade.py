@@ -0,0 +1,103 @@
+import re
+import time
+
+THINK = re.compile(r"<think>.*?</think>", flags=re.DOTALL)
+
+
+def is_clear_no(answer: str) -> bool:
+    return THINK.sub("", answer).strip().upper().startswith("NO")
+
+
+# -------------------------
+# Cascade stage
+# -------------------------
+class Stage:
+    """An answerer of the cascade with its counts, time and estimated cost.
+
+    Tokens are estimated as 4 characters per token from the prompt, the
+    pair and the answer; prices are in USD per million tokens.
+    """
+
+    def __init__(self, name: str, answer, prompt: str, price_input: float = 0, price_output: float = 0):
+        self.name = name
+        self.answer = answer
+        self.prompt_chars = len(prompt)
+        self.price_input = price_input
+        self.price_output = price_output
+        self.strings = 0
+        self.seconds = 0.0
+        self.input_tokens = self.output_tokens = 0
+
+    def __call__(self, pairs):
+        start = time.time()
+        answers = self.answer(pairs)
+        self.seconds += time.time() - start
+        self.strings += len(pairs)
+        for pair, res in zip(pairs, answers):
+            self.input_tokens += (self.prompt_chars + sum(len(text) for text in pair[:2])) // 4
+            self.output_tokens += len(res) // 4
+        return answers
+
+    def cost(self) -> float:
+        return (self.input_tokens * self.price_input + self.output_tokens * self.price_output) / 1e6
+
+    def stats(self, prefix: str) -> dict:
+        return {
+            f"{prefix}_model": self.name,
+            f"{prefix}_strings": self.strings,
+            f"{prefix}_time": f"{self.seconds:.0f}",
+            f"{prefix}_cost": round(self.cost(), 4),
+        }
+
+
+# -------------------------
+# Cascade
+# -------------------------
+class Cascade:
+    """Screen every pair with a cheap stage and escalate the doubtful ones.
+
+    Pairs the screen answers with a clear NO keep that answer. Flagged pairs
+    (YES) and answers that are neither YES nor NO go to the second stage,
+    whose answer is final. With `low` or `high`, answers that have a p(YES)
+    are escalated when it is between them instead, so confident answers of
+    the screen are final, YES included.
+    """
+
+    def __init__(self, screen: Stage, escalate: Stage, low: float = None, high: float = None):
+        self.screen = screen
+        self.escalate = escalate
+        self.low = low
+        self.high = high
+
+    def is_doubtful(self, answer) -> bool:
+        p_yes = getattr(answer, "p_yes", None)
+        if p_yes is None or (self.low is None and self.high is None):
+            return not is_clear_no(answer)
+        low = 0.0 if self.low is None else self.low
+        high = 1.0 if self.high is None else self.high
+        return low <= p_yes <= high
+
+    def answerer(self):
+        def cascaded(pairs):
+            answers = self.screen(pairs)
+            doubtful = [i for i, res in enumerate(answers) if self.is_doubtful(res)]
+            if doubtful:
+                final = self.escalate([pairs[i] for i in doubtful])
+                for i, res in zip(doubtful, final):
+                    answers[i] = res
+            return answers
+
+        return cascaded
+
+    def stats(self) -> dict:
+        stats = {**self.screen.stats("screen"), **self.escalate.stats("escalated")}
+        stats["cascade_cost"] = round(self.screen.cost() + self.escalate.cost(), 4)
+        return stats
+
+    def progress(self) -> str:
+        return (
+            f"Cascade: {self.screen.strings} strings screened by {self.screen.name} "
+            f"in {self.screen.seconds:.0f}s, {self.escalate.strings} escalated to "
+            f"{self.escalate.name} in {self.escalate.seconds:.0f}s | "
+            f"estimated cost: ${self.screen.cost() + self.escalate.cost():.4f}"
+        )
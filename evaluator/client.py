@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import loaders
+from writer import format_txt
+
+DEFAULT_SERVER = "http://127.0.0.1:8750"
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="Review PO files or segments with the model kept loaded by server.py."
+    )
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="URL of server.py")
+    parser.add_argument(
+        "--input",
+        type=str,
+        nargs="+",
+        default=[],
+        help="PO files, directories, globs or @FILE with one path per line",
+    )
+    parser.add_argument(
+        "--pair",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("ENGLISH", "CATALAN"),
+        help="Review a single segment; can be repeated",
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=None,
+        help="Jobs with higher priority are reviewed first (default: 0 for files, 10 for segments)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["size", "order"],
+        default="size",
+        help="Send the smallest files first, or in the order given",
+    )
+    parser.add_argument("--max", type=int, default=None, help="Maximum number of strings to review per file")
+    parser.add_argument("--annotate", choices=["comment", "fuzzy"], default=None)
+    parser.add_argument("--incremental", action="store_true", default=None)
+    parser.add_argument("--output_format", choices=["txt", "jsonl", "po"], default=None)
+    parser.add_argument("--resume", action="store_true", default=None)
+    parser.add_argument("--quiet", action="store_true", help="Do not print the findings to the console")
+    parser.add_argument("--summary", type=str, default=None, help="Write a JSON summary of all the reviewed files")
+    parser.add_argument("--status", action="store_true", help="Print the status of the server and exit")
+    return parser.parse_args()
+
+
+def stream(server: str, job: dict):
+    """Send a job and yield the events the server streams back."""
+    request = urllib.request.Request(
+        f"{server}/review",
+        data=json.dumps(job).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            yield json.loads(line)
+
+
+def run_job(server: str, job: dict, quiet: bool) -> dict:
+    for event in stream(server, job):
+        if event["event"] == "error":
+            raise SystemExit(f"Server error: {event['message']}")
+        if event["event"] == "queued" and not event["ready"]:
+            print("Waiting for the server to load the model")
+        elif event["event"] == "result" and not quiet:
+            if event.get("flagged", True):
+                print(format_txt(event["english"], event["catalan"], event.get("note"), event["result"]), end="")
+        elif event["event"] == "done":
+            return event["summary"]
+    raise SystemExit("The server closed the connection before the job was done")
+
+
+# -------------------------
+# Main
+# -------------------------
+if __name__ == "__main__":
+    args = get_args()
+    try:
+        if args.status:
+            with urllib.request.urlopen(f"{args.server}/status") as response:
+                print(json.dumps(json.load(response), indent=2))
+            sys.exit(0)
+
+        start_time = time.time()
+        if args.pair:
+            job = {"pairs": args.pair, "priority": 10 if args.priority is None else args.priority}
+            summary = run_job(args.server, job, args.quiet)
+            print(f"Reviewed {summary['strings']} segments, {summary['findings']} findings")
+
+        summaries = []
+        for path in loaders.expand_po_inputs(args.input, args.schedule):
+            job = {"file": os.path.abspath(path), "priority": args.priority or 0}
+            for option in ["max", "annotate", "incremental", "output_format", "resume"]:
+                if getattr(args, option) is not None:
+                    job[option] = getattr(args, option)
+            summary = run_job(args.server, job, args.quiet)
+            print(f"Reviewed {summary['strings']} strings from {path}: {summary['findings']} findings")
+            summaries.append(summary)
+    except urllib.error.URLError as e:
+        raise SystemExit(f"Cannot reach the review server at {args.server}: {e.reason}")
+
+    total_time = time.time() - start_time
+    if len(summaries) > 1:
+        strings = sum(summary["strings"] for summary in summaries)
+        findings = sum(summary["findings"] for summary in summaries)
+        print(f"Total: {len(summaries)} files, {strings} strings, {findings} findings, {total_time:.2f}s")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as fh:
+            json.dump({"files": summaries, "time": round(total_time, 2)}, fh, indent=2)
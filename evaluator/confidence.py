@@ -0,0 +1,96 @@
+import json
+import math
+import re
+
+TOP_LOGPROBS = 5
+
+
+def _candidates(logprobs):
+    """Yield (token, {alternative: logprob}) for every generated token.
+
+    Accepts the chat format of OpenAI and llama.cpp ({"content": [...]}) and
+    the completion format of older llama.cpp versions.
+    """
+    if not logprobs:
+        return
+    if logprobs.get("content") is not None:
+        for item in logprobs["content"]:
+            top = {alt["token"]: alt["logprob"] for alt in item.get("top_logprobs") or []}
+            top.setdefault(item["token"], item["logprob"])
+            yield item["token"], top
+    elif logprobs.get("tokens") is not None:
+        tops = logprobs.get("top_logprobs") or [None] * len(logprobs["tokens"])
+        for token, logprob, top in zip(logprobs["tokens"], logprobs["token_logprobs"], tops):
+            top = dict(top or {})
+            top.setdefault(token, logprob)
+            yield token, top
+
+
+def _verdict_of(token: str):
+    text = token.strip().strip("*#").upper()
+    if not text:
+        return None
+    if "YES".startswith(text):
+        return "YES"
+    if "NO".startswith(text):
+        return "NO"
+    return None
+
+
+def p_yes(logprobs):
+    """Probability of YES at the first token of the verdict, or None.
+
+    Tokens of a <think> block and leading whitespace or markdown are
+    skipped. The probabilities of the YES and NO alternatives of that
+    token are renormalized to add up to one.
+    """
+    text = ""
+    for token, top in _candidates(logprobs):
+        before, text = text, text + token
+        # Inside the <think> block, including the token that closes it
+        if "<think>" in text and "</think>" not in before:
+            continue
+        if not token.strip().strip("*#"):
+            continue
+        mass = {"YES": 0.0, "NO": 0.0}
+        for alternative, logprob in top.items():
+            verdict = _verdict_of(alternative)
+            if verdict and logprob is not None:
+                mass[verdict] += math.exp(logprob)
+        total = mass["YES"] + mass["NO"]
+        return mass["YES"] / total if total else None
+    return None
+
+
+# -------------------------
+# Scores file
+# -------------------------
+class Scores:
+    """JSON lines file with the expected label, verdict and p(YES) of every segment.
+
+    `threshold_sweep.py` recomputes the metrics at any threshold from it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fh = open(path, "w", encoding="utf-8")
+        self.scored = 0
+
+    def record(self, idx: int, answer: str, expected: bool):
+        score = getattr(answer, "p_yes", None)
+        if score is not None:
+            self.scored += 1
+        verdict = re.sub(r"<think>.*?</think>", "", answer, flags=re.DOTALL).strip().upper()
+        record = {
+            "idx": idx,
+            "expected": expected,
+            "verdict": "YES" if verdict.startswith("YES") else "NO" if verdict.startswith("NO") else "",
+            "p_yes": round(score, 6) if score is not None else None,
+        }
+        self.fh.write(json.dumps(record) + "\n")
+
+    def progress(self) -> str:
+        return f"Scores: {self.scored} strings with p(YES) written to {self.path}"
+
+    def close(self):
+        self.fh.close()
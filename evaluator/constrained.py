@@ -0,0 +1,27 @@
+from llama_cpp import LlamaGrammar
+
+# GBNF grammars that force the answer to start with the verdict
+VERDICT_ONLY = 'root ::= "YES" | "NO"'
+VERDICT_WITH_EXPLANATION = """root ::= verdict explanation
+verdict ::= "YES" | "NO"
+explanation ::= [^\\n]*
+"""
+
+
+# -------------------------
+# Verdict first decoding
+# -------------------------
+def verdict_first_kwargs(explanation_tokens: int = 0) -> dict:
+    """Generation parameters for llama.cpp that make the first token YES or NO.
+
+    Without explanation the grammar only accepts the verdict, so generation
+    stops as soon as it is known. Otherwise a one line explanation of at most
+    `explanation_tokens` tokens can follow it.
+    """
+    if explanation_tokens > 0:
+        grammar = LlamaGrammar.from_string(VERDICT_WITH_EXPLANATION, verbose=False)
+        max_tokens = explanation_tokens + 4
+    else:
+        grammar = LlamaGrammar.from_string(VERDICT_ONLY, verbose=False)
+        max_tokens = 4
+    return {"grammar": grammar, "max_tokens": max_tokens}
@@ -0,0 +1,132 @@
+import re
+
+import loaders
+from dedup import ACCELERATOR
+
+WORD = re.compile(r"\w+(?:['’-]\w+)*")
+GLOSSARY_HEADER = "Glossary:"
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def token_counter(client=None):
+    """Count tokens with the llama.cpp tokenizer of `client`, or estimate them."""
+    if client is None:
+        return estimate_tokens
+    return lambda text: len(client.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def words(text: str) -> tuple:
+    return tuple(word.lower() for word in WORD.findall(ACCELERATOR.sub("", text)))
+
+
+# -------------------------
+# Glossary index
+# -------------------------
+class GlossaryIndex:
+    """Short translated entries (terms of up to `max_words` words) indexed by their words.
+
+    The line of every term is built and tokenized once, when it is added,
+    so packing a segment only adds precomputed counts. The first
+    translation of a term wins: add the reference glossaries before the
+    catalog itself.
+    """
+
+    def __init__(self, count_tokens=estimate_tokens, max_words: int = 3):
+        self.count_tokens = count_tokens
+        self.max_words = max_words
+        self.terms = {}
+
+    def add(self, source: str, target: str):
+        key = words(source)
+        if not key or len(key) > self.max_words or key in self.terms or not target.strip():
+            return
+        line = f'- "{ACCELERATOR.sub("", source)}": "{ACCELERATOR.sub("", target)}"'
+        self.terms[key] = (line, self.count_tokens(line) + 1)
+
+    def add_file(self, path: str):
+        """Add the translated entries of a PO or TMX file."""
+        if path.endswith(".tmx"):
+            for source, target, _ in loaders.iter_tmx(path):
+                self.add(source, target)
+            return
+        for entry in loaders.iter_po(path):
+            if entry.msgid and entry.msgstr and not entry.obsolete and "fuzzy" not in entry.flags:
+                self.add(entry.msgid, entry.msgstr)
+
+    def copy(self):
+        index = GlossaryIndex(self.count_tokens, self.max_words)
+        index.terms = dict(self.terms)
+        return index
+
+    def matches(self, source: str, top_k: int):
+        """(line, tokens) of up to `top_k` terms found in `source`, longest first."""
+        tokens = words(source)
+        found = []
+        for n in range(min(self.max_words, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                key = tokens[i : i + n]
+                # The segment itself is not a useful reference
+                if key in self.terms and key != tokens and self.terms[key] not in found:
+                    found.append(self.terms[key])
+                    if len(found) >= top_k:
+                        return found
+        return found
+
+    def __len__(self):
+        return len(self.terms)
+
+
+# -------------------------
+# Context packing
+# -------------------------
+class ContextPacker:
+    """Pack the msgctxt, the translator comment and glossary matches of a segment in `budget` tokens.
+
+    Parts are added in that order while they fit; a part that does not fit
+    is skipped.
+    """
+
+    def __init__(self, index: GlossaryIndex, budget: int, top_k: int = 5):
+        self.index = index
+        self.budget = budget
+        self.top_k = top_k
+        self.header_tokens = index.count_tokens(GLOSSARY_HEADER) + 1
+        self.strings = self.packed = self.tokens = 0
+
+    def pack(self, source: str, msgctxt: str = None, note: str = None) -> str:
+        lines = []
+        used = 0
+        for line in (f"Context: {msgctxt}" if msgctxt else None, f"Translator comment: {note}" if note else None):
+            if line is None:
+                continue
+            cost = self.index.count_tokens(line) + 1
+            if used + cost <= self.budget:
+                lines.append(line)
+                used += cost
+
+        glossary = []
+        used += self.header_tokens
+        for line, cost in self.index.matches(source, self.top_k):
+            if used + cost <= self.budget:
+                glossary.append(line)
+                used += cost
+        if glossary:
+            lines += [GLOSSARY_HEADER] + glossary
+        else:
+            used -= self.header_tokens
+
+        self.strings += 1
+        if lines:
+            self.packed += 1
+            self.tokens += used
+        return "\n".join(lines)
+
+    def progress(self) -> str:
+        average = self.tokens / self.packed if self.packed else 0
+        return (
+            f"Context: {self.packed} of {self.strings} strings with context, "
+            f"{average:.0f} tokens on average (budget {self.budget}), {len(self.index)} glossary terms"
+        )
@@ -0,0 +1,88 @@
+import re
+import time
+
+from tracing import scored
+from verdict_cache import normalize
+
+WHITESPACE = re.compile(r"\s+")
+# Keyboard accelerator markers of GTK (_) and Qt/KDE (&)
+ACCELERATOR = re.compile(r"[_&](?=\w)")
+
+
+def near_normalize(text: str) -> str:
+    """Normalize away differences that do not change the review of a pair."""
+    text = ACCELERATOR.sub("", normalize(text))
+    text = text.replace("...", "…")
+    return WHITESPACE.sub(" ", text)
+
+
+# -------------------------
+# Deduplication stage
+# -------------------------
+class Deduplicator:
+    """Review every distinct pair once and give its answer to all its occurrences.
+
+    Pairs are grouped by their NFC normalized source and target, or with
+    `near` also ignoring accelerators, whitespace and "..." vs "…". The time
+    saved is estimated with the average time the wrapped answerer needed for
+    each distinct pair.
+    """
+
+    def __init__(self, near: bool = False):
+        self.normalize = near_normalize if near else normalize
+        self.answers = {}
+        self.total = 0
+        self.duplicates = 0
+        self.unique_time = 0.0
+        self.unique = 0
+
+    def key(self, pair):
+        # The context, when given, is part of the pair
+        return tuple(self.normalize(text) for text in pair)
+
+    def answerer(self, answer):
+        def deduplicated(pairs):
+            keys = [self.key(pair) for pair in pairs]
+            pending = {}
+            for i, key in enumerate(keys):
+                if key not in self.answers and key not in pending:
+                    pending[key] = i
+            if pending:
+                start = time.time()
+                fresh = answer([pairs[i] for i in pending.values()])
+                self.unique_time += time.time() - start
+                self.unique += len(pending)
+                self.answers.update(zip(pending, fresh))
+
+            self.total += len(pairs)
+            self.duplicates += len(pairs) - len(pending)
+            answers = []
+            for i, key in enumerate(keys):
+                res = self.answers[key]
+                # Only the first occurrence keeps the trace of the model call
+                if pending.get(key) != i:
+                    res = scored(str(res), getattr(res, "p_yes", None))
+                answers.append(res)
+            return answers
+
+        return deduplicated
+
+    def time_saved(self) -> float:
+        if not self.unique:
+            return 0.0
+        return self.duplicates * self.unique_time / self.unique
+
+    def stats(self) -> dict:
+        ratio = self.duplicates / self.total if self.total else 0
+        return {
+            "deduplicated": self.duplicates,
+            "dedup_ratio": round(ratio, 3),
+            "dedup_time_saved": f"{self.time_saved():.0f}",
+        }
+
+    def progress(self) -> str:
+        ratio = self.duplicates / self.total if self.total else 0
+        return (
+            f"Dedup: {self.duplicates} of {self.total} strings were repeated ({ratio:.1%}), "
+            f"~{self.time_saved():.0f}s saved"
+        )
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel
+
+
+# -------------------------
+# Draft model
+# -------------------------
+class SmallModelDraft(LlamaDraftModel):
+    """Draft tokens for speculative decoding with a small model of the same family.
+
+    llama.cpp checks the `num_pred_tokens` drafted tokens with a single
+    evaluation of the main model and keeps the ones it would have generated,
+    so greedy answers (temperature 0) do not change. The draft model must
+    share the vocabulary of the main model. It keeps its own context and
+    reuses the common prefix between calls.
+
+    The drafts accepted are counted from the input of the next call, which
+    starts with the previous input followed by the accepted tokens.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = 8, **kwargs):
+        self.llm = Llama(model_path=model_path, verbose=False, **kwargs)
+        self.name = os.path.basename(model_path)
+        self.num_pred_tokens = num_pred_tokens
+        self.reset()
+
+    def reset(self):
+        self.steps = self.drafted = self.accepted = 0
+        self.last_input = self.last_draft = None
+
+    def _count_accepted(self, input_ids):
+        last = self.last_input
+        if last is None or len(input_ids) <= len(last):
+            return
+        if not np.array_equal(input_ids[: len(last)], last):
+            # A new request
+            return
+        generated = input_ids[len(last) :]
+        for drafted, token in zip(self.last_draft, generated):
+            if drafted != token:
+                break
+            self.accepted += 1
+
+    def __call__(self, input_ids, /, **kwargs):
+        self._count_accepted(input_ids)
+        draft = []
+        for token in self.llm.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            if token == self.llm.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        self.steps += 1
+        self.drafted += len(draft)
+        self.last_input = input_ids.copy()
+        self.last_draft = draft
+        return np.array(draft, dtype=np.intc)
+
+    def acceptance(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    def tokens_per_step(self) -> float:
+        """Tokens produced by every evaluation of the main model (1 without draft)."""
+        return (self.steps + self.accepted) / self.steps if self.steps else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "draft_model": self.name,
+            "draft_acceptance": round(self.acceptance(), 3),
+            "draft_tokens_per_step": round(self.tokens_per_step(), 2),
+        }
+
+    def progress(self) -> str:
+        return (
+            f"Draft: {self.accepted} of {self.drafted} tokens drafted by {self.name} accepted "
+            f"({self.acceptance():.1%}), {self.tokens_per_step():.2f} tokens per step of the main model"
+        )
@@ -1,155 +1,251 @@
-import multiprocessing
+import functools
 import time
 import yaml
 import argparse
 import logging
 import save_json
+import loaders
+import pipeline
+import batching
+import backends
 import re
+import results_store
+from verdict_cache import VerdictCache, cached_answerer, llm_params
+from journal import Journal, journal_path
+from tracing import Trace, traced_answer
+from confidence import TOP_LOGPROBS, Scores
+from writer import ResultWriter, log_in_background, output_path
 
 # LangChain models
-from langchain_community.chat_models import ChatLlamaCpp
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import SystemMessage, HumanMessage
-from translate.storage.tmx import tmxfile
 
 
-logging.basicConfig(
-    filename="reviewer.log",
-    filemode="w",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+log_in_background("reviewer.log")
 
 
 # -------------------------
 # Model Factory
 # -------------------------
-def load_llm(model_type: str, model_path: str = None, temperature: float = 0):
-    """Return a LangChain-compatible LLM depending on model_type."""
-    if model_type == "gemma3":
-        return ChatLlamaCpp(
-            temperature=temperature,
-            model_path=model_path,
-            n_ctx=2048,
-            n_gpu_layers=8,
-            n_batch=64,
-            max_tokens=128,
-            n_threads=max(1, multiprocessing.cpu_count()),
-            repeat_penalty=1.1,
-            top_p=1.0,
-            verbose=False,
-        )
-    if model_type == "gpt-oss":
-        return ChatLlamaCpp(
-            temperature=temperature,
-            model_path=model_path,
-            n_ctx=2048,
-            n_gpu_layers=8,
-            n_batch=64,
-            max_tokens=128,
-            n_threads=max(1, multiprocessing.cpu_count()),
-            repeat_penalty=1.1,
-            top_p=1.0,
-            verbose=False,
-        )
-
-    if model_type == "mistral":
-        return ChatLlamaCpp(
-            temperature=temperature,
-            model_path=model_path,
-            n_ctx=2048,
-            n_gpu_layers=8,
-            n_batch=64,
-            max_tokens=128,
-            n_threads=max(1, multiprocessing.cpu_count()),
-            repeat_penalty=1.1,
-            top_p=1.0,
-            verbose=False,
-        )
-
-    if model_type == "qwen3":
-        return ChatLlamaCpp(
-            temperature=0.7,
-            model_path=model_path,
-            n_ctx=2048,
-            n_gpu_layers=8,
-            n_batch=64,
-            max_tokens=8192,
-            n_threads=max(1, multiprocessing.cpu_count()),
-            repeat_penalty=1.2,
-            top_p=1.0,
-            verbose=False,
-        )
-
-    elif model_type == "gpt-5":
-        return ChatOpenAI(
-            temperature=temperature,
-            model="gpt-5",
-            max_tokens=4096,
-        )
-    elif model_type == "gpt-5-mini":
-        return ChatOpenAI(
-            temperature=temperature,
-            model="gpt-5-mini",
-            max_tokens=4096,
-        )
-    elif model_type == "gemini-2.5-flash":
-        return ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=temperature,
-            max_output_tokens=4096,
-        )
-    elif model_type == "gemini-2.5-pro":
-        return ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro",
-            temperature=temperature,
-            max_output_tokens=4096,
-        )
-    else:
-        raise ValueError(f"Unsupported model_type: {model_type}")
-
-
-def get_args():
-    parser = argparse.ArgumentParser(description="Run translation reviewer.")
-    parser.add_argument("--prompt_version", type=str, default="1")
+def load_review_llm(
+    model_type: str, model_path: str, args, n_threads: int = None, use_mmap: bool = None
+):
+    """Return backends.load_llm() with the options selected in the command line."""
+    local = backends.is_local(model_type)
+    # llama.cpp only returns logprobs when the logits of every token are kept
+    overrides = {"logits_all": True} if args.scores and local else {}
+    if use_mmap is not None and local:
+        overrides["use_mmap"] = use_mmap
+    if args.draft and local:
+        overrides.update(draft=True, draft_model_path=args.draft_model_path)
+    llm = backends.load_llm(model_type, n_threads=n_threads, model_path=model_path, **overrides)
+    client = llm.client if local else None
+    if args.scores and backends.model_config(model_type)["backend"] in ("llamacpp", "openai"):
+        llm = llm.bind(logprobs=True, top_logprobs=TOP_LOGPROBS)
+    if client is not None and args.verdict_first:
+        from constrained import verdict_first_kwargs
+
+        llm = llm.bind(**verdict_first_kwargs(args.explanation_tokens))
+    if client is not None and args.prefix_cache:
+        from prefix_cache import PrefixCachedLlm
+
+        llm = PrefixCachedLlm(llm, client)
+    if args.trace:
+        from tracing import TracedLlm
+
+        llm = TracedLlm(llm, client)
+    return llm
+
+
+def get_args(argv=None):
+    # Abbreviations are off: --model would now match both --model_type and --model_path
+    parser = argparse.ArgumentParser(description="Run translation reviewer.", allow_abbrev=False)
+    parser.add_argument(
+        "--prompt_version",
+        type=str,
+        default="1",
+        help="Prompt version, or a comma separated list (e.g. 1,2,2_1) to evaluate them all with the same loaded model",
+    )
     parser.add_argument("--max", type=int, default=1000)
     parser.add_argument(
         "--model_type",
         type=str,
-        choices=[
-            "gemma3",
-            "gpt-5",
-            "gpt-5-mini",
-            "gemini-2.5-flash",
-            "gemini-2.5-pro",
-            "gpt-oss",
-            "mistral",
-            "qwen3",
-        ],
+        choices=backends.model_types(),
         default="gemma3",
         help="Which backend to use",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--model_path",
+        type=str,
+        default=None,
+        help="GGUF file of local models (default: model_path in config/<model>/backend.yml)",
+    )
+    parser.add_argument(
+        "--prefix_cache",
+        action="store_true",
+        help="Evaluate the system prompt once and reuse its KV state (local models)",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Number of strings reviewed in a single request",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of requests in flight at the same time (cloud models)",
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=None, help="Maximum requests per minute"
+    )
+    parser.add_argument(
+        "--tpm", type=float, default=None, help="Maximum prompt tokens per minute"
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="Retries on rate limit (429) and server (5xx) errors",
+    )
+    parser.add_argument(
+        "--no_cache",
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse or store verdicts in the verdict cache",
+    )
+    parser.add_argument(
+        "--cache_size_mb",
+        type=float,
+        default=512,
+        help="Maximum size of the verdict cache before evicting old entries",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes, each one with a loaded model",
+    )
+    parser.add_argument(
+        "--cpu_sets",
+        type=str,
+        default=None,
+        help="Cores for each worker: 'numa' or a list like '0-15;16-31'",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Threads used by each model (default: all the cores available to it)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Answer obvious cases (identical strings, placeholder or tag mismatches) without the model",
+    )
+    parser.add_argument(
+        "--dedup",
+        nargs="?",
+        const="exact",
+        choices=["exact", "near"],
+        default=None,
+        help="Review repeated pairs once; 'near' also groups pairs that differ in accelerators, whitespace or ellipsis",
+    )
+    parser.add_argument(
+        "--screen_model_type",
+        type=str,
+        choices=backends.model_types(),
+        default=None,
+        help="Cascade: review every string with this model first and send only the flagged or unclear ones to --model_type",
+    )
+    parser.add_argument(
+        "--screen_prompt_version",
+        type=str,
+        default=None,
+        help="Cascade: prompt of the screening stage (default: 1); without --screen_model_type the main model screens with this prompt",
+    )
+    parser.add_argument(
+        "--screen_low",
+        type=float,
+        default=None,
+        help="Cascade: escalate the strings whose p(YES) from the screen is at least this (default: 0), see --scores",
+    )
+    parser.add_argument(
+        "--screen_high",
+        type=float,
+        default=None,
+        help="Cascade: escalate the strings whose p(YES) from the screen is at most this (default: 1), see --scores",
+    )
+    parser.add_argument(
+        "--verdict_first",
+        action="store_true",
+        help="Constrain local models to answer YES or NO first and stop early",
+    )
+    parser.add_argument(
+        "--explanation_tokens",
+        type=int,
+        default=0,
+        help="With --verdict_first, tokens allowed for an explanation after the verdict",
+    )
+    parser.add_argument(
+        "--draft",
+        action="store_true",
+        help="Speculative decoding with the small draft model of config/<model>/backend.yml (local models)",
+    )
+    parser.add_argument(
+        "--draft_model_path",
+        type=str,
+        default=None,
+        help="With --draft, GGUF file of the draft model, overrides backend.yml",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write latency and token counts of every model call to output/trace-*.jsonl",
+    )
+    parser.add_argument(
+        "--scores",
+        action="store_true",
+        help="Write the p(YES) of every segment from the token logprobs to output/scores-*.jsonl "
+        "for threshold_sweep.py (llama.cpp and OpenAI models)",
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=["txt", "jsonl", "po"],
+        default="txt",
+        help="Format of the results file: readable text, JSON lines or PO entries with the answer as comment",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Do not print the findings to the console",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its journal instead of starting again",
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        type=int,
+        default=50,
+        help="Strings between checkpoints of the counters in the journal",
+    )
+    return parser.parse_args(argv)
 
 
 # -------------------------
 # Prompt & Metadata
 # -------------------------
 def load_prompt(model: str, prompt_version: str):
-    if model in ["gemini-2.5-pro", "gemini-2.5-flash"]:
-        model = "gemini"
-    elif model in ["gpt-5", "gpt-5-mini"]:
-        model = "gpt"
-
-    with open(f"config/{model}/prompt-v{prompt_version}.txt", "r") as file:
+    with open(f"{backends.prompt_dir(model)}/prompt-v{prompt_version}.txt", "r") as file:
         return file.read()
 
 
 def load_metadata(model: str, prompt_version: str):
     try:
         prompt_version = int(prompt_version.replace("_", ""))
-        with open(f"config/{model}/metadata.yml", "r") as fh:
+        with open(f"{backends.prompt_dir(model)}/metadata.yml", "r") as fh:
             data = yaml.safe_load(fh)
             data = data["versions"]
             return data[prompt_version]["goal"]
@@ -161,54 +257,47 @@ def load_metadata(model: str, prompt_version: str):
 # -------------------------
 # Translation Logic
 # -------------------------
-def translate(llm, prompt: str, english: str, catalan: str) -> str:
-    english = english.replace("_", "")
-    catalan = catalan.replace("_", "")
+def remove_accelerators(text: str) -> str:
+    return text.replace("_", "")
+
+
+def build_messages(prompt: str, english: str, catalan: str):
+    english = remove_accelerators(english)
+    catalan = remove_accelerators(catalan)
     text_to_review = f"English: '''{english}'''\nCatalan: '''{catalan}'''"
-    messages = [
+    return [
         SystemMessage(content=prompt),
         HumanMessage(content=text_to_review),
     ]
-    ai_msg = llm.invoke(messages)
+
+
+def read_answer(english: str, catalan: str, ai_msg) -> str:
     answer = (ai_msg.content or "").strip()
-    logging.info(f"s: {english}")
-    logging.info(f"t: {catalan}")
+    logging.info(f"s: {remove_accelerators(english)}")
+    logging.info(f"t: {remove_accelerators(catalan)}")
     logging.info(f"a: {answer}\n")
-    return answer
+    return traced_answer(answer, ai_msg)
 
 
-def _write(english: str, catalan: str, note: str, result: str, fh, status: str):
-    lines = [
-        f"English: {english}",
-        f"Catalan: {catalan}",
-    ]
-    if note:
-        lines.append(f"Note: {note}")
-    lines.append(f"Result: {result}")
-    lines.append(f"Status: {status}")
-    lines.append("\n-----------------------\n")
-    content = "\n".join(lines)
-    fh.write(content + "\n")
-    print(content)
+def translate(llm, prompt: str, english: str, catalan: str) -> str:
+    ai_msg = llm.invoke(build_messages(prompt, english, catalan))
+    return read_answer(english, catalan, ai_msg)
 
 
 def load_strings(dataset: str, max_entries=-1):
-    with open(dataset, "rb") as file:
-        tmx = tmxfile(file, "en", "ca")
-    strings = []
-    notes = 0
-    for tu in tmx.unit_iter():
-        source = tu.source
-        target = tu.target
-        note = tu.getnotes()
-        if note:
-            notes += 1
-        strings.append((source, target, note))
-        if len(strings) == max_entries:
+    """Yield (source, target, note) lazily, stopping after max_entries."""
+    for count, unit in enumerate(loaders.iter_tmx(dataset, "en", "ca"), start=1):
+        yield unit
+        if count == max_entries:
             break
 
-    total = len(strings)
-    errors = notes
+
+def count_strings(dataset: str, max_entries=-1) -> int:
+    """Number of strings load_strings yields, read without keeping them."""
+    return sum(1 for _ in load_strings(dataset, max_entries))
+
+
+def print_dataset_stats(total: int, errors: int):
     correct = total - errors
 
     error_pct = (errors / total) * 100 if total > 0 else 0
@@ -217,7 +306,6 @@ def load_strings(dataset: str, max_entries=-1):
     print(
         f"DATASET. Loaded {total} strings with {errors} translation errors. Errors {error_pct:.2f}%, correct: {correct_pct:.2f}%"
     )
-    return strings
 
 
 def calc_metrics(tp, fp, fn, elapsed, processed):
@@ -232,59 +320,163 @@ def calc_metrics(tp, fp, fn, elapsed, processed):
     return precision, recall, sets_per_min, f1
 
 
-if __name__ == "__main__":
-    args = get_args()
+# -------------------------
+# Evaluation
+# -------------------------
+def is_concurrent(args, model_type: str) -> bool:
+    return args.concurrency > 1 and not backends.is_local(model_type)
+
+
+def uses_batches(args, model_type: str, pool=None) -> bool:
+    """Whether model_answerer reviews several strings in a single request."""
+    return not pool and not is_concurrent(args, model_type) and args.batch_size > 1
+
+
+def model_answerer(args, model_type: str, prompt: str, llm=None, pool=None):
+    """Return the answerer that sends pairs to the model, and its chunk size."""
+    if pool:
+        pool.reset()
+        return pool.answerer(prompt), args.workers * 8
+    if is_concurrent(args, model_type):
+        from async_engine import RateLimiter, async_answerer
+
+        answer = async_answerer(
+            llm,
+            prompt,
+            build_messages,
+            read_answer,
+            concurrency=args.concurrency,
+            limiter=RateLimiter(args.rpm, args.tpm),
+            max_retries=args.max_retries,
+        )
+        return answer, args.concurrency * 4
+    if uses_batches(args, model_type, pool):
+        answer = batching.batch_answerer(
+            llm, prompt, translate, clean=remove_accelerators
+        )
+        return answer, args.batch_size
+    return pipeline.single_answerer(llm, prompt, translate), 1
 
-    if args.model_type == "gemma3":
-        path = "/home/jordi/sc/llama/llama.cpp/download/google_gemma-3-12b-it-Q8_0.gguf"
-    elif args.model_type == "gpt-oss":
-        path = "/home/jordi/sc/llama/llama.cpp/download/gpt-oss-20b-UD-Q8_K_XL.gguf"
-    elif args.model_type == "mistral":
-        path = "/home/jordi/sc/llama/llama.cpp/download/Mistral-Small-24B-Instruct-2501.Q8_0.gguf"
-    elif args.model_type == "qwen3":
-        path = "/home/jordi/sc/llama/llama.cpp/download/Qwen3-30B-A3B-Q8_0.gguf"
-    else:
-        if args.model_type not in [
-            "gpt-5-mini",
-            "gpt-5",
-            "gemini-2.5-flash",
-            "gemini-2.5-pro",
-        ]:
-            raise ValueError("Unknown model")
-        else:
-            path = None
 
-    llm = load_llm(args.model_type, path)
-    prompt, metadata = load_prompt(args.model_type, args.prompt_version), load_metadata(
-        args.model_type, args.prompt_version
-    )
+def model_prices(model_type: str):
+    config = backends.model_config(model_type)
+    return config.get("price_input", 0), config.get("price_output", 0)
 
-    dataset = "dataset/dataset.tmx"
-    strings = load_strings(dataset, args.max)
-    total_strings = min(len(strings), args.max)
+
+def run_evaluation(
+    args, prompt_version: str, path: str, strings, llm=None, pool=None, screen=None, store=None, total=None
+):
+    """Review the strings with one prompt version and return its stats record.
+
+    `total` is the number of strings, used for the progress and the output
+    names; it is counted from `strings` when they are a list.
+
+    With a results `store` (results_store.connect()) the answer to every
+    segment and the stats record are stored as a new run.
+
+    `screen` is an optional (model_type, llm, prompt) that reviews every
+    string first, so that only the doubtful ones reach the main model.
+    """
+    prompt = load_prompt(args.model_type, prompt_version)
+    metadata = load_metadata(args.model_type, prompt_version)
+
+    answer, chunk_size = model_answerer(args, args.model_type, prompt, llm, pool)
+    cascade = None
+    if screen:
+        from cascade import Cascade, Stage
+
+        screen_type, screen_llm, screen_prompt = screen
+        screen_answer, screen_chunk = model_answerer(args, screen_type, screen_prompt, screen_llm)
+        chunk_size = max(chunk_size, screen_chunk)
+        cascade = Cascade(
+            Stage(screen_type, screen_answer, screen_prompt, *model_prices(screen_type)),
+            Stage(args.model_type, answer, prompt, *model_prices(args.model_type)),
+            low=args.screen_low,
+            high=args.screen_high,
+        )
+        answer = cascade.answerer()
+
+    prefilter = None
+    if args.prefilter:
+        from prefilter import Prefilter
+
+        prefilter = Prefilter()
+        answer = prefilter.measure(answer)
+
+    params = pool.params() if pool else llm_params(llm)
+    if screen:
+        params["screen"] = [screen[0], screen[2], llm_params(screen[1])]
+        if args.screen_low is not None or args.screen_high is not None:
+            params["screen"].append([args.screen_low, args.screen_high])
+    mode = batching.review_mode(args.batch_size if uses_batches(args, args.model_type, pool) else 1)
+    namespace = VerdictCache.namespace(args.model_type, path, prompt, params, mode)
+    cache = None
+    if not args.no_cache:
+        cache = VerdictCache(max_size_mb=args.cache_size_mb)
+        answer = cached_answerer(answer, cache, namespace)
+    if prefilter:
+        answer = prefilter.answerer(answer)
+
+    if total is None:
+        total = len(strings) if isinstance(strings, list) else args.max
+    output = f"output/results-{total}-{args.model_type}-v{prompt_version}.txt"
+    journal = Journal(journal_path(output), namespace, resume=args.resume)
+    answer = cached_answerer(answer, journal, namespace)
+
+    dedup = None
+    if args.dedup:
+        from dedup import Deduplicator
+
+        dedup = Deduplicator(near=args.dedup == "near")
+        answer = dedup.answerer(answer)
+
+    trace = None
+    if args.trace:
+        trace = Trace(f"output/trace-{total}-{args.model_type}-v{prompt_version}.jsonl")
+    run = results_store.Run(store, args.model_type, prompt_version) if store else None
+    # Drafts of workers are counted in their own processes and not reported
+    draft = backends.draft_model(llm) if llm else None
+    if draft:
+        draft.reset()
+    scores = None
+    if args.scores:
+        scores = Scores(f"output/scores-{total}-{args.model_type}-v{prompt_version}.jsonl")
 
     tp = fp = fn = tn = processed = 0
-    start_time = time.time()
-
-    with open(
-        f"output/results-{args.max}-{args.model_type}-v{args.prompt_version}.txt",
-        "w",
-        encoding="utf-8",
-    ) as file:
-        for idx, (en, ca, note) in enumerate(strings, start=1):
-            res = translate(llm, prompt, en, ca)
+    start_time = time.time() - journal.elapsed()
+
+    with ResultWriter(
+        output_path(output, args.output_format), args.output_format, quiet=args.quiet
+    ) as writer:
+        for idx, (en, ca, note), res in pipeline.review(strings, answer, chunk_size):
+            if processed and processed % args.checkpoint_every == 0:
+                journal.save_checkpoint(
+                    processed=processed,
+                    tp=tp,
+                    fp=fp,
+                    fn=fn,
+                    tn=tn,
+                    elapsed=time.time() - start_time,
+                )
             processed += 1
-
-            if idx % 10 == 0 or idx == args.max:
+            if trace:
+                trace.record(idx, res)
+            if scores:
+                scores.record(idx, res, bool(note))
+            if run:
+                run.add(idx, en, ca, bool(note), res)
+
+            if idx % 10 == 0 or idx == total:
                 elapsed = time.time() - start_time
                 precision, recall, spm, f1 = calc_metrics(
                     tp, fp, fn, elapsed, processed
                 )
                 print(
-                    f"Progress: {(idx/total_strings)*100:.2f}% - {idx}/{total_strings} | "
+                    f"Progress: {(idx/total)*100:.2f}% - {idx}/{total} | "
                     f"set/min: {spm:.2f} | Time: {elapsed:.2f}s | "
                     f"TP: {tp}, TN: {tn}, FP: {fp}, FN: {fn} | "
                     f"Precision: {precision:.2f}, Recall: {recall:.2f}, F1 {f1:.2f}"
+                    + (f" | {cache.progress()}" if cache else "")
                 )
 
             remove_thinking = re.sub(r"<think>.*?</think>", "", res, flags=re.DOTALL)
@@ -296,7 +488,7 @@ if __name__ == "__main__":
             if res.upper().startswith("NO"):
                 if note:
                     fn += 1
-                    _write(en, ca, note, full_answer, file, "fn")
+                    writer.write(en, ca, note, full_answer, "fn")
                 else:
                     tn += 1
                 continue
@@ -306,18 +498,54 @@ if __name__ == "__main__":
 
             if note:
                 tp += 1
-                _write(en, ca, note, full_answer, file, "tp")
+                writer.write(en, ca, note, full_answer, "tp")
             else:
                 fp += 1
-                _write(en, ca, note, full_answer, file, "fp")
+                writer.write(en, ca, note, full_answer, "fp")
 
     total_time = time.time() - start_time
-    prompt_version = args.prompt_version
-    prompt_comment = metadata
-    save_json.save_json(
+    journal.save_checkpoint(
+        processed=processed, tp=tp, fp=fp, fn=fn, tn=tn, elapsed=total_time
+    )
+    journal.close()
+    if args.resume:
+        print(journal.progress())
+    print_dataset_stats(processed, tp + fn)
+    precision, recall, spm, f1 = calc_metrics(tp, fp, fn, total_time, processed)
+    extra = {}
+    if pool:
+        extra["workers"] = pool.report()
+    if prefilter:
+        print(prefilter.progress())
+        extra.update(prefilter.stats())
+    if dedup:
+        print(dedup.progress())
+        extra.update(dedup.stats())
+    if cascade:
+        print(cascade.progress())
+        extra.update(cascade.stats())
+    if draft:
+        print(draft.progress())
+        extra.update(draft.stats())
+        baseline = results_store.baseline_time(store, args.model_type, prompt_version, processed) if store else None
+        if baseline and total_time:
+            extra["draft_speedup"] = round(baseline / total_time, 2)
+            print(f"Speedup over the last run without draft: {extra['draft_speedup']}x")
+    if cache:
+        extra.update(cache.stats())
+        cache.close()
+    if trace:
+        print(trace.progress())
+        extra.update(trace.summary())
+        trace.close()
+    if scores:
+        print(scores.progress())
+        scores.close()
+    print(f"Total time used: {total_time:.2f} seconds")
+    record = save_json.build_record(
         args.model_type,
         prompt_version,
-        prompt_comment,
+        metadata,
         tp,
         fp,
         fn,
@@ -326,6 +554,75 @@ if __name__ == "__main__":
         recall,
         f1,
         total_time,
-        processed,
+        extra,
     )
-    print(f"Total time used: {total_time:.2f} seconds")
+    if run:
+        run.finish(record, processed)
+    return record, processed
+
+
+if __name__ == "__main__":
+    args = get_args()
+    if args.verdict_first and args.batch_size > 1:
+        print("--verdict_first answers one string per request, ignoring --batch_size")
+        args.batch_size = 1
+    if args.concurrency > 1 and backends.is_local(args.model_type):
+        print("Concurrent requests are not supported by local models, ignoring --concurrency")
+    elif args.concurrency > 1 and args.batch_size > 1:
+        raise SystemExit("--concurrency sends one string per request, it cannot be used with --batch_size")
+    if args.workers > 1 and args.batch_size > 1:
+        raise SystemExit("--workers reviews one string per request, it cannot be used with --batch_size")
+    if not 0 <= (args.screen_low or 0) <= (1 if args.screen_high is None else args.screen_high) <= 1:
+        raise SystemExit("--screen_low and --screen_high are probabilities, with --screen_low <= --screen_high")
+
+    path = backends.model_config(args.model_type, model_path=args.model_path).get(
+        "model_path"
+    )
+    prompt_versions = args.prompt_version.split(",")
+
+    # The model is loaded once and shared by all the prompt versions
+    pool = llm = None
+    if args.workers > 1:
+        from sharding import WorkerPool
+
+        pool = WorkerPool(
+            args.workers,
+            functools.partial(load_review_llm, args.model_type, path, args),
+            load_prompt(args.model_type, prompt_versions[0]),
+            translate,
+            cpu_set_spec=args.cpu_sets,
+            threads=args.threads,
+        )
+    else:
+        llm = load_review_llm(args.model_type, path, args, n_threads=args.threads)
+
+    screen = None
+    if args.screen_model_type or args.screen_prompt_version:
+        screen_type = args.screen_model_type or args.model_type
+        if screen_type == args.model_type and llm is not None:
+            screen_llm = llm
+        else:
+            screen_path = backends.model_config(screen_type).get("model_path")
+            screen_llm = load_review_llm(screen_type, screen_path, args)
+        screen_prompt = load_prompt(screen_type, args.screen_prompt_version or "1")
+        screen = (screen_type, screen_llm, screen_prompt)
+
+    dataset = "dataset/dataset.tmx"
+    strings = load_strings(dataset, args.max)
+    if len(prompt_versions) > 1:
+        strings = list(strings)
+        total = len(strings)
+    else:
+        # A first pass over the file counts the strings without keeping them
+        total = count_strings(dataset, args.max)
+
+    store = results_store.connect()
+    for prompt_version in prompt_versions:
+        print(f"Evaluating {args.model_type} with prompt version {prompt_version}")
+        run_evaluation(
+            args, prompt_version, path, strings, llm=llm, pool=pool, screen=screen, store=store, total=total
+        )
+
+    if pool:
+        pool.close()
+    store.close()
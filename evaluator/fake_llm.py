@@ -0,0 +1,84 @@
+import asyncio
+import math
+import random
+import time
+import zlib
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeMessage:
+    def __init__(self, content: str, prompt_tokens: int = 0, p_yes: float = 0.5):
+        self.content = content
+        # Logprobs of the first token in the format of OpenAI and llama.cpp
+        first = content.split()[0]
+        alternatives = {"YES": math.log(max(p_yes, 1e-9)), "NO": math.log(max(1 - p_yes, 1e-9))}
+        self.response_metadata = {
+            "logprobs": {
+                "content": [
+                    {
+                        "token": first,
+                        "logprob": alternatives[first],
+                        "top_logprobs": [
+                            {"token": token, "logprob": logprob}
+                            for token, logprob in alternatives.items()
+                        ],
+                    }
+                ]
+            }
+        }
+        # Rough token counts, 4 characters per token
+        self.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": max(1, len(content) // 4),
+        }
+
+
+# -------------------------
+# Fake chat model
+# -------------------------
+class FakeChatModel:
+    """Offline stand-in for a LangChain chat model.
+
+    Answers are deterministic for a given request: a request is flagged with
+    YES when the hash of its last message falls below `yes_rate`, with a
+    p(YES) in its logprobs above 0.5 for YES and below for NO. Every call
+    waits `latency` seconds. Asynchronous calls, the ones that compete for
+    the provider rate limit, fail with a 429 error with probability
+    `rate_limit_rate`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        yes_rate: float = 0.1,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.yes_rate = yes_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+
+    def _answer(self, messages) -> FakeMessage:
+        text = messages[-1].content
+        prompt_tokens = sum(len(message.content) for message in messages) // 4
+        draw = zlib.crc32(text.encode("utf-8")) / 2**32
+        # p(YES) agrees with the verdict and is closest to 0.5 next to `yes_rate`
+        if draw < self.yes_rate:
+            p_yes = 0.51 + 0.49 * (1 - draw / self.yes_rate)
+            return FakeMessage("YES - fake review flagged this translation", prompt_tokens, p_yes)
+        p_yes = 0.49 * (1 - draw) / (1 - self.yes_rate)
+        return FakeMessage("NO", prompt_tokens, p_yes)
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(self.latency)
+        return self._answer(messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.rate_limit_rate:
+            raise RateLimitError("429 Too Many Requests (fake)")
+        return self._answer(messages)
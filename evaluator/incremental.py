@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+
+
+def manifest_path(po_path: str) -> str:
+    return os.path.splitext(po_path)[0] + ".manifest.json"
+
+
+# -------------------------
+# Review manifest
+# -------------------------
+class Manifest:
+    """Answers given to every entry of a PO file in the last review.
+
+    Entries are keyed by the hash of their msgid and msgstr. The manifest is
+    only reused when it was produced with the same model and prompt
+    (`signature`). It can be used as the cache of `cached_answerer`: unchanged
+    entries reuse their previous answer and only new or modified entries are
+    sent to the model.
+    """
+
+    def __init__(self, path: str, signature: str):
+        self.path = path
+        self.signature = signature
+        self.previous = {}
+        self.current = {}
+        self.reused = self.reviewed = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            print(f"No previous manifest at {self.path}, reviewing all entries")
+            return
+        with open(self.path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("signature") != self.signature:
+            print("Previous manifest was produced with another model or prompt, ignoring it")
+            return
+        self.previous = data["entries"]
+        print(f"Loaded manifest with {len(self.previous)} reviewed entries")
+
+    def save(self, complete: bool = True):
+        """Save the answers of this review; an interrupted one keeps the previous answers too."""
+        entries = self.current if complete else {**self.previous, **self.current}
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(
+                {"signature": self.signature, "entries": entries},
+                fh,
+                ensure_ascii=False,
+            )
+
+    @staticmethod
+    def key(signature: str, pair) -> str:
+        return hashlib.sha256("\0".join(pair).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        answer = self.previous.get(key)
+        if answer is not None:
+            self.current[key] = answer
+            self.reused += 1
+        return answer
+
+    def put(self, key: str, answer: str):
+        self.current[key] = answer
+        self.reviewed += 1
+
+    def progress(self) -> str:
+        return f"Incremental: {self.reused} unchanged entries reused, {self.reviewed} reviewed"
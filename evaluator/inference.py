@@ -1,44 +1,63 @@
-import multiprocessing
+import functools
+import json
 import time
 import yaml
 import argparse
 import logging
-import polib
+import loaders
+import pipeline
+import backends
+from batching import batch_answerer, review_mode
+from verdict_cache import VerdictCache, cached_answerer, llm_params
+from incremental import Manifest, manifest_path
+from journal import Journal, journal_path
+from annotate import PoAnnotator, annotated_path
+from dedup import Deduplicator
+from writer import ResultWriter, check_output, log_in_background, output_path
+from sharding import WorkerPool
+from prefilter import Prefilter
+from context import ContextPacker, GlossaryIndex, token_counter
 
 # LangChain Gemma model
-from langchain_community.chat_models import ChatLlamaCpp
 from langchain.schema import SystemMessage, HumanMessage
 
-logging.basicConfig(
-    filename="inference.log",
-    filemode="w",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+log_in_background("inference.log")
 
 
 # -------------------------
 # Load Gemma 3
 # -------------------------
-def load_llm(model_path: str, temperature: float = 0):
-    """Return Gemma 3 model (via llama.cpp)."""
-    return ChatLlamaCpp(
-        temperature=temperature,
+def load_llm(model_path: str, args, n_threads: int = None, use_mmap: bool = None):
+    """Return Gemma 3 model (via llama.cpp) configured in config/gemma3/backend.yml."""
+    return backends.load_llm(
+        "gemma3",
+        n_threads=n_threads,
         model_path=model_path,
-        n_ctx=4096,
-        n_gpu_layers=8,
-        n_batch=64,
-        max_tokens=512,
-        n_threads=max(1, multiprocessing.cpu_count()),
-        repeat_penalty=1.1,
-        top_p=1.0,
-        verbose=False,
+        n_ctx=args.n_ctx,
+        max_tokens=args.max_tokens,
+        draft=args.draft or None,
+        use_mmap=use_mmap,
     )
 
 
-def get_args():
+def load_review_llm(model_path: str, args, n_threads: int = None, use_mmap: bool = None):
+    """Return load_llm() with the llama.cpp options selected in the command line."""
+    llm = load_llm(model_path, args, n_threads=n_threads, use_mmap=use_mmap)
+    client = llm.client
+    if args.verdict_first:
+        from constrained import verdict_first_kwargs
+
+        llm = llm.bind(**verdict_first_kwargs(args.explanation_tokens))
+    if args.prefix_cache:
+        from prefix_cache import PrefixCachedLlm
+
+        llm = PrefixCachedLlm(llm, client)
+    return llm
+
+
+def build_parser(input_required: bool = True):
     parser = argparse.ArgumentParser(
-        description="Run translation inference with Gemma 3."
+        description="Run translation inference with Gemma 3.", allow_abbrev=False
     )
     parser.add_argument("--prompt_version", type=str, default="1")
     parser.add_argument(
@@ -47,13 +66,174 @@ def get_args():
         type=str,
         help="Path to Gemma 3 model file (.gguf)",
     )
+    parser.add_argument(
+        "--n_ctx",
+        type=int,
+        help="Context size, overrides config/gemma3/backend.yml",
+    )
+    parser.add_argument(
+        "--max_tokens",
+        type=int,
+        help="Maximum generated tokens, overrides config/gemma3/backend.yml",
+    )
     parser.add_argument(
         "--input",
         type=str,
-        required=True,
-        help="PO input file",
+        nargs="+",
+        required=input_required,
+        help="PO files, directories, globs or @FILE with one path per line",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=["size", "order"],
+        default="size",
+        help="Review the smallest files first, or in the order given",
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        default=None,
+        help="Write a JSON summary of all the reviewed files",
+    )
+    parser.add_argument(
+        "--max",
+        type=int,
+        default=-1,
+        help="Maximum number of strings to review (default: all)",
+    )
+    parser.add_argument(
+        "--prefix_cache",
+        action="store_true",
+        help="Evaluate the system prompt once and reuse its KV state",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Number of strings reviewed in a single request",
+    )
+    parser.add_argument(
+        "--no_cache",
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse or store verdicts in the verdict cache",
+    )
+    parser.add_argument(
+        "--cache_size_mb",
+        type=float,
+        default=512,
+        help="Maximum size of the verdict cache before evicting old entries",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only review entries that changed since the last run, reusing its findings",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Manifest of the last run, also written without --incremental (default: FILE.manifest.json next to the input)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes, each one with a loaded model",
+    )
+    parser.add_argument(
+        "--cpu_sets",
+        type=str,
+        default=None,
+        help="Cores for each worker: 'numa' or a list like '0-15;16-31'",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Threads used by each model (default: all the cores available to it)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Answer obvious cases (identical strings, placeholder or tag mismatches) without the model",
+    )
+    parser.add_argument(
+        "--dedup",
+        nargs="?",
+        const="exact",
+        choices=["exact", "near"],
+        default=None,
+        help="Review repeated pairs once; 'near' also groups pairs that differ in accelerators, whitespace or ellipsis",
+    )
+    parser.add_argument(
+        "--verdict_first",
+        action="store_true",
+        help="Constrain the model to answer YES or NO first and stop early",
+    )
+    parser.add_argument(
+        "--explanation_tokens",
+        type=int,
+        default=0,
+        help="With --verdict_first, tokens allowed for an explanation after the verdict",
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=["txt", "jsonl", "po"],
+        default="txt",
+        help="Format of the findings: readable text, JSON lines or PO entries with the answer as comment (FILE.review.po)",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Do not print the findings to the console",
+    )
+    parser.add_argument(
+        "--annotate",
+        choices=["comment", "fuzzy"],
+        default=None,
+        help="Write FILE.annotated.po, a copy of the input with the findings as translator comments (and fuzzy flag)",
+    )
+    parser.add_argument(
+        "--draft",
+        action="store_true",
+        help="Speculative decoding with the small draft model of config/gemma3/backend.yml",
+    )
+    parser.add_argument(
+        "--context_tokens",
+        type=int,
+        default=0,
+        help="Add the msgctxt, translator comment and glossary matches of every string in up to this many tokens",
+    )
+    parser.add_argument(
+        "--glossary",
+        type=str,
+        nargs="+",
+        default=[],
+        help="With --context_tokens, PO or TMX files whose short entries are used as glossary before the catalog's own",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--glossary_matches",
+        type=int,
+        default=5,
+        help="With --context_tokens, maximum glossary terms added to a string",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its journal instead of starting again",
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        type=int,
+        default=100,
+        help="Strings between checkpoints in the journal",
+    )
+    return parser
+
+
+def get_args():
+    return build_parser().parse_args()
 
 
 # -------------------------
@@ -78,8 +258,10 @@ def load_metadata(prompt_version: str):
 # -------------------------
 # Translation Inference
 # -------------------------
-def translate(llm, prompt: str, english: str, catalan: str) -> str:
+def translate(llm, prompt: str, english: str, catalan: str, context: str = "") -> str:
     text_to_review = f"English: '''{english}'''\nCatalan: '''{catalan}'''"
+    if context:
+        text_to_review += f"\n{context}"
     messages = [
         SystemMessage(content=prompt),
         HumanMessage(content=text_to_review),
@@ -92,42 +274,226 @@ def translate(llm, prompt: str, english: str, catalan: str) -> str:
     return answer
 
 
-def load_strings(dataset: str, max_entries: int = -1):
-    po = polib.pofile(dataset)
-    strings = []
-    for idx, entry in enumerate(po, start=1):
-        # Skip fuzzy or obsolete entries
+def load_strings(dataset: str, max_entries: int = -1, annotator=None, packer=None):
+    """Yield (source, target, context, note, slot) lazily, stopping after max_entries.
+
+    With an annotator every entry of the file is registered in it, and `slot`
+    identifies the entry to annotate with its answer. With a packer,
+    `context` holds the context of the entry for the model; otherwise it is
+    empty.
+    """
+    count = 0
+    for entry in loaders.iter_po(dataset):
+        if max_entries > 0 and count >= max_entries:
+            if annotator is None:
+                break
+            annotator.add(entry, review=False)
+            continue
+
+        # Skip the header, fuzzy or obsolete entries
         source = entry.msgid
         target = entry.msgstr.strip()
 
-        if entry.obsolete or "fuzzy" in entry.flags or len(target) == 0:
+        if not source or entry.obsolete or "fuzzy" in entry.flags or len(target) == 0:
+            if annotator:
+                annotator.add(entry, review=False)
             continue
 
         source = entry.msgid
         target = entry.msgstr
         note = entry.comment or ""
-        strings.append((source, target, note))
+        context = packer.pack(source, entry.msgctxt, note) if packer else ""
+        slot = annotator.add(entry) if annotator else None
+        yield source, target, context, note, slot
+        count += 1
 
-        if max_entries > 0 and len(strings) >= max_entries:
-            break
 
-    print(f"Loaded {len(strings)} strings from {dataset}")
-    return strings
+# -------------------------
+# Review of one file
+# -------------------------
+def review_file(
+    path: str, args, answer, chunk_size: int, namespace: str, dedup=None, glossary=None
+) -> dict:
+    """Review one PO file with the shared answerer and return its summary."""
+    reviewed = iter_review_file(path, args, answer, chunk_size, namespace, dedup, glossary)
+    while True:
+        try:
+            next(reviewed)
+        except StopIteration as done:
+            return done.value
 
 
-def _write(english: str, catalan: str, note: str, result: str, fh):
-    lines = [
-        f"English: {english}",
-        f"Catalan: {catalan}",
-    ]
-    if note:
-        lines.append(f"Note: {note}")
-    lines.append(f"Result: {result}")
-    lines.append("\n-----------------------\n")
-    content = "\n".join(lines)
-    fh.write(content + "\n")
-    fh.flush()
-    print(content)
+def iter_review_file(
+    path: str, args, answer, chunk_size: int, namespace: str, dedup=None, glossary=None
+):
+    """Review one PO file, yielding after every string, and return its summary.
+
+    A finding is yielded as a dict, other strings as None; the server uses
+    the pauses to answer more urgent jobs. Journal, manifest, annotated copy
+    and findings are kept per file. With a `glossary` (GlossaryIndex) and
+    --context_tokens, the index is extended with the terms of this catalog
+    and every string is reviewed with its packed context.
+    """
+    # The manifest is only written when it is going to be used
+    manifest = None
+    if args.incremental or args.manifest:
+        manifest = Manifest(check_output(args.manifest or manifest_path(path), path), namespace)
+
+    annotator = None
+    if args.annotate:
+        annotator = PoAnnotator(check_output(annotated_path(path), path), args.annotate)
+    packer = None
+    if glossary is not None and args.context_tokens > 0:
+        index = glossary.copy()
+        index.add_file(path)
+        packer = ContextPacker(index, args.context_tokens, args.glossary_matches)
+    strings = load_strings(path, args.max, annotator, packer)
+
+    # The dedup is shared by all the files: it goes under the caches of this
+    # file, so the journal and the manifest record every pair of the file
+    if dedup:
+        answer = dedup.answerer(answer)
+
+    output = path.replace(".po", ".txt")
+    journal = Journal(journal_path(output), namespace, resume=args.resume)
+    answer = cached_answerer(answer, journal, namespace)
+
+    if manifest:
+        if args.incremental:
+            manifest.load()
+        answer = cached_answerer(answer, manifest, namespace)
+
+    processed = findings = 0
+    start_time = time.time() - journal.elapsed()
+    finished = False
+
+    # The server closes the generator of a cancelled job: the files are
+    # still closed and the answers given so far kept
+    try:
+        with ResultWriter(
+            output_path(output, args.output_format), args.output_format, quiet=args.quiet
+        ) as writer:
+            fields = 3 if packer else 2
+            for idx, (en, ca, _, note, slot), res in pipeline.review(
+                strings, answer, chunk_size, fields
+            ):
+                if processed and processed % args.checkpoint_every == 0:
+                    journal.save_checkpoint(
+                        processed=processed, elapsed=time.time() - start_time
+                    )
+                processed += 1
+
+                if idx % 100 == 0:
+                    elapsed = time.time() - start_time
+                    print(f"Progress: {idx} strings | Time: {elapsed:.2f}s")
+
+                if annotator:
+                    annotator.annotate(slot, res)
+
+                if not res.upper().startswith("YES"):
+                    yield None
+                    continue
+
+                findings += 1
+                writer.write(en, ca, note, res)
+                yield {"idx": idx, "english": en, "catalan": ca, "note": note, "result": str(res)}
+        finished = True
+    finally:
+        if annotator:
+            # Entries not reached are copied unchanged
+            for _ in strings:
+                pass
+            annotator.close()
+        total_time = time.time() - start_time
+        journal.save_checkpoint(processed=processed, elapsed=total_time)
+        journal.close()
+        if manifest:
+            manifest.save(complete=finished)
+
+    if annotator:
+        print(annotator.progress())
+    if packer:
+        print(packer.progress())
+    print(f"Reviewed {processed} strings from {path}")
+    if args.incremental:
+        print(manifest.progress())
+    if args.resume:
+        print(journal.progress())
+    return {
+        "file": path,
+        "strings": processed,
+        "findings": findings,
+        "time": round(total_time, 2),
+    }
+
+
+def print_summary(summaries, total_time: float):
+    strings = sum(summary["strings"] for summary in summaries)
+    findings = sum(summary["findings"] for summary in summaries)
+    print(f"\nSummary of {len(summaries)} files:")
+    for summary in summaries:
+        print(
+            f"{summary['file']}: {summary['strings']} strings, "
+            f"{summary['findings']} findings, {summary['time']:.2f}s"
+        )
+    print(f"Total: {strings} strings, {findings} findings, {total_time:.2f}s")
+
+
+# -------------------------
+# Shared answerer
+# -------------------------
+def build_answerer(args, prompt: str, llm=None, pool=None):
+    """Answerer shared by all the files: model, prefilter and verdict cache.
+
+    Returns (answer, chunk_size, namespace, cache, prefilter).
+    """
+    chunk_size = args.batch_size
+    if pool:
+        answer = pool.answer
+        chunk_size = args.workers * 8
+    elif args.batch_size > 1:
+        answer = batch_answerer(llm, prompt, translate)
+    else:
+        answer = pipeline.single_answerer(llm, prompt, translate)
+
+    prefilter = None
+    if args.prefilter:
+        prefilter = Prefilter()
+        answer = prefilter.measure(answer)
+
+    params = pool.params() if pool else llm_params(llm)
+    # Workers review one string per request
+    mode = review_mode(1 if pool else args.batch_size)
+    namespace = VerdictCache.namespace("gemma3", args.model_path, prompt, params, mode)
+    cache = None
+    if not args.no_cache:
+        cache = VerdictCache(max_size_mb=args.cache_size_mb)
+        answer = cached_answerer(answer, cache, namespace)
+    if prefilter:
+        answer = prefilter.answerer(answer)
+    return answer, chunk_size, namespace, cache, prefilter
+
+
+def build_glossary(args, llm=None):
+    """Glossary index of the --glossary files, counting tokens with the model tokenizer.
+
+    With workers there is no model in this process and tokens are estimated.
+    """
+    glossary = GlossaryIndex(token_counter(getattr(llm, "client", None)))
+    for path in args.glossary:
+        glossary.add_file(path)
+    prompt_tokens = glossary.count_tokens(load_prompt(args.prompt_version))
+    config = {
+        **backends.LLAMACPP_DEFAULTS,
+        **backends.model_config("gemma3", n_ctx=args.n_ctx, max_tokens=args.max_tokens),
+    }
+    # Leave some room for the string itself
+    if prompt_tokens + args.context_tokens + config["max_tokens"] + 256 > config["n_ctx"]:
+        print(
+            f"Warning: the prompt ({prompt_tokens} tokens), --context_tokens and max_tokens "
+            f"{config['max_tokens']} may not fit in n_ctx {config['n_ctx']}"
+        )
+    return glossary
 
 
 # -------------------------
@@ -135,39 +501,72 @@ def _write(english: str, catalan: str, note: str, result: str, fh):
 # -------------------------
 if __name__ == "__main__":
     args = get_args()
+    if args.verdict_first and args.batch_size > 1:
+        print("--verdict_first answers one string per request, ignoring --batch_size")
+        args.batch_size = 1
+    if args.workers > 1 and args.batch_size > 1:
+        raise SystemExit("--workers reviews one string per request, it cannot be used with --batch_size")
+
+    inputs = loaders.expand_po_inputs(args.input, args.schedule)
+    if not inputs:
+        raise SystemExit(f"No PO files found in {' '.join(args.input)}")
+    if args.manifest and len(inputs) > 1:
+        raise SystemExit("--manifest can only be used with a single input file")
 
-    llm = load_llm(args.model_path)
     prompt, metadata = load_prompt(args.prompt_version), load_metadata(
         args.prompt_version
     )
 
-    strings = load_strings(args.input)
-
-    start_time = time.time()
-    output = args.input.replace(".po", ".txt")
-    processed = 0
-    start_time = time.time()
-    total_strings = len(strings)
+    # One model (or worker pool) serves all the files
+    pool = llm = None
+    if args.workers > 1:
+        pool = WorkerPool(
+            args.workers,
+            functools.partial(load_review_llm, args.model_path, args),
+            prompt,
+            translate,
+            cpu_set_spec=args.cpu_sets,
+            threads=args.threads,
+        )
+    else:
+        llm = load_review_llm(args.model_path, args, n_threads=args.threads)
 
-    with open(
-        output,
-        "w",
-        encoding="utf-8",
-    ) as file:
-        for idx, (en, ca, note) in enumerate(strings, start=1):
-            res = translate(llm, prompt, en, ca)
-            processed += 1
+    answer, chunk_size, namespace, cache, prefilter = build_answerer(args, prompt, llm, pool)
 
-            if idx % 100 == 0:
-                elapsed = time.time() - start_time
-                print(
-                    f"Progress: {(idx/total_strings)*100:.2f}% - {idx}/{total_strings} | Time: {elapsed:.2f}s"
-                )
+    dedup = None
+    if args.dedup:
+        dedup = Deduplicator(near=args.dedup == "near")
 
-            if not res.upper().startswith("YES"):
-                continue
+    glossary = None
+    if args.context_tokens > 0:
+        glossary = build_glossary(args, llm)
 
-            _write(en, ca, note, res, file)
+    start_time = time.time()
+    summaries = []
+    for number, path in enumerate(inputs, start=1):
+        if len(inputs) > 1:
+            print(f"Reviewing {path} ({number}/{len(inputs)})")
+        summaries.append(
+            review_file(path, args, answer, chunk_size, namespace, dedup, glossary)
+        )
+        if cache:
+            print(cache.progress())
 
     total_time = time.time() - start_time
+    if len(inputs) > 1:
+        print_summary(summaries, total_time)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as fh:
+            json.dump({"files": summaries, "time": round(total_time, 2)}, fh, indent=2)
+    if pool:
+        pool.report()
+        pool.close()
+    if prefilter:
+        print(prefilter.progress())
+    if dedup:
+        print(dedup.progress())
+    if llm and backends.draft_model(llm):
+        print(backends.draft_model(llm).progress())
+    if cache:
+        cache.close()
     print(f"Total time used: {total_time:.2f} seconds")
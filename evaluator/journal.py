@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import time
+
+from tracing import scored
+
+
+def journal_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + ".journal"
+
+
+# -------------------------
+# Run journal
+# -------------------------
+class Journal:
+    """Append-only JSON lines log of the answers given during a run.
+
+    Every answer is appended as it is produced and the counters of the run
+    are written as checkpoint records. Records are flushed as they are
+    written, which survives a crash of the process, and fsync'd every
+    `sync_every` records and at every checkpoint, which survives a crash of
+    the machine. It can be used as the cache of `cached_answerer`: with
+    `resume` the answers of an interrupted run with the same `signature` are
+    replayed in order and only the remaining pairs are sent to the model.
+    """
+
+    def __init__(self, path: str, signature: str, resume: bool = False, sync_every: int = 50):
+        self.path = path
+        self.signature = signature
+        self.sync_every = sync_every
+        self.previous = {}
+        self.checkpoint = {}
+        self.resumed = 0
+        self.pending = 0
+
+        if resume:
+            self.load()
+        mode = "a" if self.previous or self.checkpoint else "w"
+        self.fh = open(path, mode, encoding="utf-8")
+        if mode == "w":
+            self._append({"signature": signature})
+        self.sync()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            print(f"No journal at {self.path}, starting from the beginning")
+            return
+        records = []
+        valid = 0
+        with open(self.path, "rb") as fh:
+            for line in fh:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Last line cut by the crash
+                    break
+                valid += len(line)
+        if not records or records[0].get("signature") != self.signature:
+            print("Journal was produced with another model or prompt, starting from the beginning")
+            return
+        with open(self.path, "r+b") as fh:
+            fh.truncate(valid)
+        for record in records[1:]:
+            if "key" in record:
+                answer = scored(record["answer"], record.get("p_yes"))
+                self.previous.setdefault(record["key"], []).append(answer)
+            else:
+                self.checkpoint = record
+        answers = sum(len(answers) for answers in self.previous.values())
+        print(f"Resuming from journal with {answers} reviewed strings")
+
+    def _append(self, record: dict):
+        self.fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.fh.flush()
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.fh.fileno())
+        self.pending = 0
+
+    @staticmethod
+    def key(signature: str, pair) -> str:
+        return hashlib.sha256("\0".join(pair).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        answers = self.previous.get(key)
+        if not answers:
+            return None
+        self.resumed += 1
+        return answers.pop(0)
+
+    def put(self, key: str, answer: str):
+        record = {"key": key, "answer": answer}
+        if getattr(answer, "p_yes", None) is not None:
+            record["p_yes"] = answer.p_yes
+        self._append(record)
+
+    def elapsed(self) -> float:
+        """Time spent by the interrupted run up to its last checkpoint."""
+        return self.checkpoint.get("elapsed", 0.0)
+
+    def save_checkpoint(self, **counters):
+        self.checkpoint = {**counters, "time": time.time()}
+        self._append(self.checkpoint)
+        self.sync()
+
+    def progress(self) -> str:
+        return f"Resume: {self.resumed} strings replayed from {self.path}"
+
+    def close(self):
+        self.sync()
+        self.fh.close()
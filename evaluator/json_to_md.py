@@ -13,16 +13,31 @@ def load_json(path: Path):
     return data
 
 
+def format_cell(value) -> str:
+    # e.g. the set/min of every worker
+    if isinstance(value, dict):
+        return ", ".join(f"{key}: {item}" for key, item in value.items())
+    return str(value)
+
+
 def build_md_table(data: list[dict], headers: list[str]) -> str:
     lines = [
         "| " + " | ".join(headers) + " |",
         "| " + " | ".join(["---"] * len(headers)) + " |",
     ]
     for row in data:
-        lines.append("| " + " | ".join(str(row.get(h, "")) for h in headers) + " |")
+        lines.append("| " + " | ".join(format_cell(row.get(h, "")) for h in headers) + " |")
     return "\n".join(lines)
 
 
+def all_keys(data: list[dict]) -> list[str]:
+    """Keys of every record in order of appearance; older records may lack some."""
+    headers = []
+    for row in data:
+        headers += [key for key in row if key not in headers]
+    return headers
+
+
 def save_md(content: str, path: Path):
     with open(path, "w", encoding="utf-8") as f:
         f.write(content)
@@ -30,19 +45,30 @@ def save_md(content: str, path: Path):
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python json_to_md.py <path_to_json_file>")
+        print("Usage: python json_to_md.py <path_to_json_file | results.db [strings]>")
         sys.exit(1)
 
     json_path = Path(sys.argv[1])
-    data = load_json(json_path)
+    if json_path.suffix == ".db":
+        import results_store
+
+        strings = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        data = results_store.load_stats(results_store.connect(str(json_path)), strings)
+    else:
+        data = load_json(json_path)
 
     # Full version
-    all_headers = list(data[0].keys())
+    all_headers = all_keys(data)
     full_md = build_md_table(data, all_headers)
     save_md(full_md, json_path.with_suffix(".md"))
     print(f"Full Markdown table written to {json_path.with_suffix('.md')}")
 
-    small_headers = [h for h in all_headers if h not in ["date_time", "strings"]]
+    # Accuracy and throughput, without the detailed latency and token columns
+    small_headers = [
+        h
+        for h in all_headers
+        if h not in ["date_time", "strings", "latency_p95", "latency_p99", "prompt_tokens"]
+    ]
     if small_headers:
         small_md = build_md_table(data, small_headers)
         save_md(small_md, json_path.with_name(json_path.stem + "_small.md"))
@@ -0,0 +1,195 @@
+import glob
+import os
+import xml.etree.ElementTree as ET
+
+import polib
+
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+# -------------------------
+# TMX
+# -------------------------
+def _seg_text(tuv) -> str:
+    seg = tuv.find("seg")
+    return "".join(seg.itertext()) if seg is not None else ""
+
+
+def iter_tmx(path: str, source_lang: str = "en", target_lang: str = "ca"):
+    """Yield (source, target, note) for every translation unit of a TMX file.
+
+    The file is parsed incrementally and every unit is discarded once it has
+    been yielded, so memory does not grow with the size of the file.
+    """
+    body = None
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if element.tag == "body":
+                body = element
+            continue
+        if element.tag != "tu":
+            continue
+
+        # Fall back to the position of the variant when the language code
+        # does not match, as translate-toolkit does.
+        tuvs = element.findall("tuv")
+        texts = {}
+        for tuv in tuvs:
+            lang = (tuv.get(XML_LANG) or tuv.get("lang") or "").strip().lower()
+            texts.setdefault(lang.split("-")[0], _seg_text(tuv))
+        positional = [_seg_text(tuv) for tuv in tuvs[:2]] + ["", ""]
+        source = texts.get(source_lang, positional[0])
+        target = texts.get(target_lang, positional[1])
+        notes = [note.text or "" for note in element.findall("note")]
+        yield source, target, "\n".join(notes)
+
+        if body is not None:
+            body.clear()
+
+
+# -------------------------
+# PO
+# -------------------------
+KEYWORDS = {"msgctxt": "ct", "msgid": "mi", "msgid_plural": "mp", "msgstr": "ms"}
+PREVIOUS_KEYWORDS = {"msgctxt": "pc", "msgid": "pm", "msgid_plural": "pp"}
+CONTINUED_FIELDS = {
+    "ct": "msgctxt",
+    "mi": "msgid",
+    "mp": "msgid_plural",
+    "ms": "msgstr",
+    "pc": "previous_msgctxt",
+    "pm": "previous_msgid",
+    "pp": "previous_msgid_plural",
+}
+
+
+def iter_po(path: str, encoding: str = "utf-8"):
+    """Yield the polib.POEntry objects of a PO file one by one.
+
+    Follows the same rules as polib's parser, but entries are produced as
+    soon as they are read instead of after loading the whole catalog. The
+    header entry (empty msgid) is yielded too.
+    """
+    entry = polib.POEntry()
+    state = None
+    started = False
+    plural_index = 0
+
+    def next_entry():
+        nonlocal entry, state, started
+        if state in ["ms", "mx"]:
+            finished = entry
+            entry = polib.POEntry()
+            state = None
+            started = False
+            return finished
+        return None
+
+    with open(path, "r", encoding=encoding) as fh:
+        for number, line in enumerate(fh, start=1):
+            if number == 1:
+                line = line.lstrip("\ufeff")
+            line = line.strip()
+            if not line:
+                continue
+
+            tokens = line.split(None, 2)
+            if tokens[0] == "#~|":
+                continue
+            obsolete = tokens[0] == "#~" and len(tokens) > 1
+            if obsolete:
+                line = line[3:].strip()
+                tokens = tokens[1:]
+
+            keyword = tokens[0]
+            if keyword in KEYWORDS and len(tokens) > 1:
+                symbol = KEYWORDS[keyword]
+                if symbol in ["ct", "mi"]:
+                    finished = next_entry()
+                    if finished is not None:
+                        yield finished
+                value = polib.unescape(line[len(keyword) :].lstrip()[1:-1])
+                if symbol == "mi":
+                    entry.obsolete = obsolete
+                setattr(entry, CONTINUED_FIELDS[symbol], value)
+                state = symbol
+                started = True
+            elif line.startswith("msgstr["):
+                plural_index = int(line[7 : line.index("]")])
+                value = line[line.find('"') + 1 : -1]
+                entry.msgstr_plural[plural_index] = polib.unescape(value)
+                state = "mx"
+            elif line.startswith('"'):
+                value = polib.unescape(line[1:-1])
+                if state == "mx":
+                    entry.msgstr_plural[plural_index] += value
+                elif state in CONTINUED_FIELDS:
+                    field = CONTINUED_FIELDS[state]
+                    setattr(entry, field, getattr(entry, field) + value)
+            elif line.startswith("#"):
+                finished = next_entry()
+                if finished is not None:
+                    yield finished
+                if keyword == "#:" and len(tokens) > 1:
+                    for occurrence in line[3:].split():
+                        name, _, linenum = occurrence.rpartition(":")
+                        if not name or not linenum.isdigit():
+                            name, linenum = occurrence, ""
+                        entry.occurrences.append((name, linenum))
+                elif keyword == "#," and len(tokens) > 1:
+                    entry.flags += [flag.strip() for flag in line[3:].split(",")]
+                elif keyword == "#." and len(tokens) > 1:
+                    entry.comment += ("\n" if entry.comment else "") + line[3:]
+                elif keyword == "#|" and len(tokens) > 1:
+                    previous = line[2:].lstrip()
+                    name = previous.split(None, 1)[0]
+                    if previous.startswith('"') and state in CONTINUED_FIELDS:
+                        field = CONTINUED_FIELDS[state]
+                        value = polib.unescape(previous[1:-1])
+                        setattr(entry, field, getattr(entry, field) + value)
+                    elif name in PREVIOUS_KEYWORDS:
+                        state = PREVIOUS_KEYWORDS[name]
+                        value = previous[len(name) :].lstrip()[1:-1]
+                        setattr(entry, CONTINUED_FIELDS[state], polib.unescape(value))
+                elif keyword == "#" or keyword.startswith("##"):
+                    tcomment = line.lstrip("#")
+                    if tcomment.startswith(" "):
+                        tcomment = tcomment[1:]
+                    entry.tcomment += ("\n" if entry.tcomment else "") + tcomment
+
+    if started:
+        yield entry
+
+
+# Files written by inference.py next to the reviewed ones
+GENERATED_SUFFIXES = (".annotated.po", ".review.po")
+
+
+def expand_po_inputs(specs, schedule: str = "size"):
+    """Return the PO files named by files, directories, globs or @list files.
+
+    Directories are searched recursively. With `schedule` "size" the
+    smallest files come first, so their results are ready early; "order"
+    keeps the order given.
+    """
+    paths = []
+    for spec in specs:
+        if spec.startswith("@"):
+            with open(spec[1:], "r", encoding="utf-8") as fh:
+                listed = [line.strip() for line in fh if line.strip()]
+            paths += expand_po_inputs(listed, "order")
+        elif os.path.isdir(spec):
+            paths += sorted(glob.glob(os.path.join(spec, "**", "*.po"), recursive=True))
+        elif glob.has_magic(spec):
+            paths += sorted(glob.glob(spec, recursive=True))
+        else:
+            paths.append(spec)
+
+    paths = [
+        path
+        for path in dict.fromkeys(paths)
+        if not path.endswith(GENERATED_SUFFIXES)
+    ]
+    if schedule == "size":
+        paths.sort(key=os.path.getsize)
+    return paths
@@ -0,0 +1,39 @@
+# -------------------------
+# Review pipeline
+# -------------------------
+# An "answerer" is a function that receives a list of (english, catalan) pairs
+# and returns the model answer for each of them, in the same order.
+
+
+def chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def single_answerer(llm, prompt: str, translate):
+    """Answer every pair with its own request."""
+
+    def answer(pairs):
+        return [translate(llm, prompt, *pair) for pair in pairs]
+
+    return answer
+
+
+def review(items, answer, chunk_size: int = 1, fields: int = 2):
+    """Yield (idx, item, answer) for every item, keeping the input order.
+
+    Items are tuples that start with the English and Catalan strings; the
+    answerer receives their first `fields` elements (3 to pass the context).
+    """
+    idx = 0
+    for chunk in chunks(items, max(1, chunk_size)):
+        answers = answer([tuple(item[:fields]) for item in chunk])
+        for item, res in zip(chunk, answers):
+            idx += 1
+            yield idx, item, res
@@ -0,0 +1,143 @@
+import re
+import time
+from collections import Counter
+
+PRINTF = re.compile(
+    r"%(\d+\$|\([\w.-]+\))?[-+0#_^]*\d*(?:\.\d+)?(?:hh|ll|[hlLqjzt])?([diouxXeEfFgGcsp])"
+)
+BRACES = re.compile(r"\$?\{\w*\}")
+TAG = re.compile(r"<(/?)([A-Za-z][\w:.-]*)([^<>]*?)(/?)>")
+# Pango and HTML tags that may appear without attributes or closing tag
+MARKUP_TAGS = {
+    "a", "b", "big", "br", "em", "hr", "i", "img", "p",
+    "s", "small", "span", "strong", "sub", "sup", "tt", "u",
+}
+URL = re.compile(r"(?:https?|ftp)://\S+|mailto:\S+|www\.\S+")
+NUMBER = re.compile(r"\d+(?:[.,:]\d+)*")
+
+
+def _without_accelerators(text: str) -> str:
+    return text.replace("_", "").strip()
+
+
+def placeholders(text: str) -> Counter:
+    """Placeholders by position or name and conversion, ignoring flags and width."""
+    printf = ["%" + position + conversion for position, conversion in PRINTF.findall(text)]
+    return Counter(printf + BRACES.findall(text))
+
+
+def markup(text: str) -> list:
+    """Matches of the markup tags of a text.
+
+    Angle brackets are also used for placeholders meant to be translated,
+    like "<file>" in command line help, so a tag is only markup when it is
+    closed in the text, has attributes, closes itself or is a known tag.
+    """
+    matches = list(TAG.finditer(text))
+    closed = {match.group(2) for match in matches if match.group(1)}
+    return [
+        match
+        for match in matches
+        if match.group(1)
+        or match.group(4)
+        or "=" in match.group(3)
+        or match.group(2) in closed
+        or match.group(2).lower() in MARKUP_TAGS
+    ]
+
+
+def tags(text: str) -> Counter:
+    return Counter(match.group(2) for match in markup(text))
+
+
+def _is_untranslatable(text: str) -> bool:
+    """True when the text has only placeholders, tags, URLs and numbers."""
+    for match in reversed(markup(text)):
+        text = text[: match.start()] + text[match.end() :]
+    for pattern in [URL, PRINTF, BRACES, NUMBER]:
+        text = pattern.sub("", text)
+    return not re.search(r"\w", text.replace("_", ""))
+
+
+# -------------------------
+# Deterministic checks
+# -------------------------
+def check(english: str, catalan: str):
+    """Return a 'YES - ...'/'NO - ...' answer for obvious cases, else None."""
+    source_placeholders, target_placeholders = placeholders(english), placeholders(catalan)
+    if source_placeholders != target_placeholders:
+        missing = list((source_placeholders - target_placeholders).elements())
+        extra = list((target_placeholders - source_placeholders).elements())
+        return f"YES - Placeholders do not match. Missing: {missing}, unexpected: {extra}"
+
+    missing = list((tags(english) - tags(catalan)).elements())
+    if missing:
+        return f"YES - Markup tags missing in the translation: {missing}"
+
+    if _without_accelerators(english) == _without_accelerators(catalan):
+        return "NO - Source and translation are identical"
+
+    if (
+        _is_untranslatable(english)
+        and Counter(URL.findall(english)) == Counter(URL.findall(catalan))
+        and Counter(NUMBER.findall(english)) == Counter(NUMBER.findall(catalan))
+    ):
+        return "NO - Only placeholders, tags, URLs or numbers"
+
+    return None
+
+
+# -------------------------
+# Pipeline stage
+# -------------------------
+class Prefilter:
+    """Answer obvious pairs with `check` and send the rest to the model.
+
+    `measure` wraps the model answerer to learn the average model latency,
+    which is used to estimate the time saved by the short-circuited pairs.
+    """
+
+    def __init__(self):
+        self.short_circuited = 0
+        self.model_strings = 0
+        self.model_time = 0.0
+
+    def measure(self, answer):
+        def measured(pairs):
+            start = time.time()
+            answers = answer(pairs)
+            self.model_time += time.time() - start
+            self.model_strings += len(pairs)
+            return answers
+
+        return measured
+
+    def answerer(self, answer):
+        def prefiltered(pairs):
+            answers = [check(*pair[:2]) for pair in pairs]
+            pending = [i for i, res in enumerate(answers) if res is None]
+            self.short_circuited += len(pairs) - len(pending)
+            if pending:
+                fresh = answer([pairs[i] for i in pending])
+                for i, res in zip(pending, fresh):
+                    answers[i] = res
+            return answers
+
+        return prefiltered
+
+    def time_saved(self) -> float:
+        if not self.model_strings:
+            return 0.0
+        return self.short_circuited * self.model_time / self.model_strings
+
+    def stats(self) -> dict:
+        return {
+            "prefiltered": self.short_circuited,
+            "prefilter_time_saved": f"{self.time_saved():.0f}",
+        }
+
+    def progress(self) -> str:
+        return (
+            f"Prefilter: {self.short_circuited} strings answered without the model, "
+            f"~{self.time_saved():.0f}s saved"
+        )
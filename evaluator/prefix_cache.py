@@ -0,0 +1,64 @@
+from llama_cpp import Llama
+
+# Two user turns that differ only after the system prompt, used to find where
+# the chat template stops rendering the shared prefix.
+PROBES = [
+    "English: '''A'''\nCatalan: '''A'''",
+    "English: '''B'''\nCatalan: '''B'''",
+]
+
+
+# -------------------------
+# Prompt prefix KV cache
+# -------------------------
+class PrefixCachedLlm:
+    """Wrap a ChatLlamaCpp model so the system prompt is evaluated only once.
+
+    llama.cpp already reuses the longest common prefix of the tokens in its
+    context, so requests with the same system prompt in a row do not
+    evaluate it again. The first time a system prompt is seen its tokens are
+    evaluated and the llama.cpp state is saved; the state is only restored
+    when the context does not start with that prompt any more, e.g. after a
+    request with another prompt (prompt versions, batches, a screening
+    stage sharing the model). Restoring copies the whole state, which is
+    large with `logits_all`.
+    """
+
+    def __init__(self, llm, client=None):
+        self.llm = llm
+        self.client = client or llm.client
+        self.states = {}
+        self.restored = 0
+
+    def _render_tokens(self, system: str, user: str):
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+        self.client.create_chat_completion(messages=messages, max_tokens=1)
+        return self.client._input_ids.tolist()
+
+    def _snapshot(self, system: str):
+        rendered = [self._render_tokens(system, probe) for probe in PROBES]
+        prefix_len = Llama.longest_token_prefix(rendered[0], rendered[1])
+        self.client.reset()
+        self.client.eval(rendered[0][:prefix_len])
+        print(f"Prompt prefix cached: {prefix_len} tokens")
+        return rendered[0][:prefix_len], self.client.save_state()
+
+    def _restore(self, messages):
+        system = messages[0].content
+        if system not in self.states:
+            self.states[system] = self._snapshot(system)
+        prefix, state = self.states[system]
+        if self.client._input_ids[: len(prefix)].tolist() == prefix:
+            return
+        self.client.load_state(state)
+        self.restored += 1
+
+    def invoke(self, messages, **kwargs):
+        self._restore(messages)
+        return self.llm.invoke(messages, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from cascade import is_clear_no
+
+DEFAULT_PATH = "output/results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_time TEXT NOT NULL,
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    strings INTEGER,
+    stats TEXT
+);
+CREATE TABLE IF NOT EXISTS segments (
+    segment_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    segment_id INTEGER NOT NULL,
+    expected INTEGER NOT NULL,
+    flagged INTEGER NOT NULL,
+    answer TEXT,
+    p_yes REAL,
+    wall REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    PRIMARY KEY (run_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_segment ON results (segment_id, run_id);
+"""
+
+
+def segment_id(source: str, target: str) -> int:
+    """Stable 63-bit id of a segment, the same in every run that reviews it."""
+    digest = hashlib.sha1(f"{source}\0{target}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def connect(path: str = DEFAULT_PATH) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Concurrent runs wait for each other's short write transactions
+    db = sqlite3.connect(path, timeout=60)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+# -------------------------
+# Recording a run
+# -------------------------
+class Run:
+    """Per-segment results of one evaluation run.
+
+    Results are buffered and inserted `flush_every` at a time, each batch in
+    its own short transaction, so several runs can append to the same store
+    at once. The stats record of the run is stored by `finish`.
+    """
+
+    def __init__(self, db: sqlite3.Connection, model: str, version: str, flush_every: int = 256):
+        self.db = db
+        self.flush_every = flush_every
+        self.pending = []
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO runs (date_time, model, version) VALUES (?, ?, ?)",
+                (now, model, version),
+            )
+        self.run_id = cursor.lastrowid
+
+    def add(self, idx: int, source: str, target: str, expected: bool, answer: str):
+        """Record the answer to a segment; `answer` may carry a trace and p(YES)."""
+        flagged = not is_clear_no(answer)
+        trace = getattr(answer, "trace", None) or {}
+        self.pending.append(
+            (
+                idx,
+                source,
+                target,
+                expected,
+                flagged,
+                # A plain NO tells nothing more than the flag
+                None if answer.strip().upper() == "NO" else str(answer),
+                getattr(answer, "p_yes", None),
+                trace.get("wall"),
+                trace.get("prompt_tokens"),
+                trace.get("completion_tokens"),
+            )
+        )
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO segments VALUES (?, ?, ?)",
+                [(segment_id(row[1], row[2]), row[1], row[2]) for row in self.pending],
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (self.run_id, row[0], segment_id(row[1], row[2]), *row[3:])
+                    for row in self.pending
+                ],
+            )
+        self.pending = []
+
+    def finish(self, record: dict, strings: int):
+        self.flush()
+        with self.db:
+            self.db.execute(
+                "UPDATE runs SET strings = ?, stats = ? WHERE run_id = ?",
+                (strings, json.dumps(record, ensure_ascii=False), self.run_id),
+            )
+
+
+# -------------------------
+# Queries
+# -------------------------
+def load_stats(db: sqlite3.Connection, strings: int = None) -> list[dict]:
+    """Stats records of the finished runs, oldest first, like the stats JSON files."""
+    query = "SELECT stats FROM runs WHERE stats IS NOT NULL"
+    params = ()
+    if strings is not None:
+        query += " AND strings = ?"
+        params = (strings,)
+    rows = db.execute(query + " ORDER BY run_id", params)
+    return [json.loads(stats) for (stats,) in rows]
+
+
+def baseline_time(db: sqlite3.Connection, model: str, version: str, strings: int):
+    """Time of the last finished run of the same evaluation without a draft model."""
+    rows = db.execute(
+        "SELECT stats FROM runs WHERE model = ? AND version = ? AND strings = ? "
+        "AND stats IS NOT NULL ORDER BY run_id DESC",
+        (model, version, strings),
+    )
+    for (stats,) in rows:
+        stats = json.loads(stats)
+        if "draft_model" not in stats:
+            return float(stats["time"])
+    return None
+
+
+def resolve_run(db: sqlite3.Connection, spec: str) -> int:
+    """Run id from an id or from MODEL:VERSION (the latest finished run)."""
+    if spec.isdigit():
+        return int(spec)
+    model, _, version = spec.rpartition(":")
+    row = db.execute(
+        "SELECT max(run_id) FROM runs WHERE model = ? AND version = ? AND stats IS NOT NULL",
+        (model, version),
+    ).fetchone()
+    if row[0] is None:
+        raise ValueError(f"No finished run of {model} with prompt version {version}")
+    return row[0]
+
+
+def flagged_only_by(db: sqlite3.Connection, run_a: int, run_b: int):
+    """Segments flagged by run A but not by run B, when both reviewed them."""
+    return db.execute(
+        "SELECT a.idx, s.source, s.target, a.expected, a.answer "
+        "FROM results a JOIN results b ON b.segment_id = a.segment_id AND b.run_id = ? "
+        "JOIN segments s ON s.segment_id = a.segment_id "
+        "WHERE a.run_id = ? AND a.flagged AND NOT b.flagged ORDER BY a.idx",
+        (run_b, run_a),
+    ).fetchall()
+
+
+def disagreement(db: sqlite3.Connection, run_a: int, run_b: int) -> tuple[int, int]:
+    """Segments reviewed by both runs and how many of them got different flags."""
+    return db.execute(
+        "SELECT count(*), coalesce(sum(a.flagged != b.flagged), 0) "
+        "FROM results a JOIN results b ON b.segment_id = a.segment_id AND b.run_id = ? "
+        "WHERE a.run_id = ?",
+        (run_b, run_a),
+    ).fetchone()
+
+
+def print_runs(db: sqlite3.Connection):
+    rows = db.execute(
+        "SELECT run_id, date_time, model, version, strings, stats FROM runs ORDER BY run_id"
+    )
+    for run_id, date_time, model, version, strings, stats in rows:
+        f1 = json.loads(stats)["f1"] if stats else "unfinished"
+        print(f"{run_id:>4}  {date_time}  {model}:{version}  strings: {strings}  F1: {f1}")
+
+
+def print_matrix(db: sqlite3.Connection, runs: list[int], labels: list[str]):
+    width = max(len(label) for label in labels)
+    print(" " * width + "  " + "  ".join(f"{label:>{width}}" for label in labels))
+    for run_a, label in zip(runs, labels):
+        cells = []
+        for run_b in runs:
+            compared, different = disagreement(db, run_a, run_b)
+            cells.append(f"{different / compared:.1%}" if compared else "-")
+        print(f"{label:>{width}}  " + "  ".join(f"{cell:>{width}}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the per-segment results of evaluation runs.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="Results store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="List the runs")
+    diff = commands.add_parser("diff", help="Segments flagged by run A but not by run B")
+    diff.add_argument("run_a", help="Run id or MODEL:VERSION, e.g. gemma3:1")
+    diff.add_argument("run_b")
+    matrix = commands.add_parser("matrix", help="Share of segments where each pair of runs disagrees")
+    matrix.add_argument("runs", nargs="+")
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    if args.command == "runs":
+        print_runs(db)
+    elif args.command == "diff":
+        run_a, run_b = resolve_run(db, args.run_a), resolve_run(db, args.run_b)
+        rows = flagged_only_by(db, run_a, run_b)
+        for idx, source, target, expected, answer in rows:
+            print(f"[{idx}] {'error' if expected else 'correct'}")
+            print(f"English: {source}")
+            print(f"Catalan: {target}")
+            print(f"Result: {answer}\n")
+        print(f"{len(rows)} segments flagged by {args.run_a} but not by {args.run_b}")
+    else:
+        print_matrix(db, [resolve_run(db, spec) for spec in args.runs], args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,7 @@
-import json
-import os
 from datetime import datetime
 
 
-def save_json(
+def build_record(
     model,
     prompt_version,
     prompt_comment,
@@ -15,9 +13,8 @@ def save_json(
     recall,
     f1,
     total_time,
-    processed,
+    extra=None,
 ):
-    json_path = f"output/stats_{processed}.json"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     record = {
@@ -34,18 +31,6 @@ def save_json(
         "f1": round(f1, 2),
         "time": f"{total_time:.0f}",
     }
-
-    if os.path.exists(json_path):
-        with open(json_path, "r", encoding="utf-8") as fh:
-            try:
-                data = json.load(fh)
-                if not isinstance(data, list):
-                    data = [data]  # ensure it's always a list
-            except json.JSONDecodeError:
-                data = []
-        data.append(record)
-    else:
-        data = [record]
-
-    with open(json_path, "w", encoding="utf-8") as fh:
-        json.dump(data, fh, indent=2, ensure_ascii=False)
+    if extra:
+        record.update(extra)
+    return record
@@ -0,0 +1,356 @@
+import copy
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import inference
+import pipeline
+from dedup import Deduplicator
+
+DEFAULT_PORT = 8750
+# Seconds without events before a progress event is sent to the client
+HEARTBEAT = 1.0
+
+# Options of inference.py that each file job may set, with their check
+JOB_OPTIONS = {
+    "max": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "annotate": lambda value: value in ("comment", "fuzzy"),
+    "incremental": lambda value: isinstance(value, bool),
+    "output_format": lambda value: value in ("txt", "jsonl", "po"),
+    "resume": lambda value: isinstance(value, bool),
+}
+
+
+def review_path(path, root: str) -> str:
+    """Real path of a PO file under `root`; the server writes its outputs next to it."""
+    if not isinstance(path, str):
+        raise ValueError("'file' is the path of a PO file")
+    real = os.path.realpath(os.path.join(root, path))
+    if not real.endswith(".po"):
+        raise ValueError(f"Only .po files can be reviewed: {path}")
+    if os.path.commonpath([real, root]) != root:
+        raise PermissionError(f"{path} is not under the root of the server {root}")
+    if not os.path.isfile(real):
+        raise FileNotFoundError(f"File not found: {path}")
+    return real
+
+
+def parse_job(request, root: str) -> dict:
+    """Validated job of a request: 'pairs', or a 'file' under `root` with its options."""
+    if not isinstance(request, dict) or ("file" in request) == ("pairs" in request):
+        raise ValueError("A job has either a 'file' or a list of 'pairs'")
+    priority = request.get("priority", 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        raise ValueError(f"Invalid priority: {priority!r}")
+    job = {"priority": priority}
+    if "pairs" in request:
+        pairs = request["pairs"]
+        if not isinstance(pairs, list) or not all(
+            isinstance(pair, list) and len(pair) >= 2 and all(isinstance(text, str) for text in pair[:2])
+            for pair in pairs
+        ):
+            raise ValueError("'pairs' is a list of [english, catalan] pairs")
+        job["pairs"] = [tuple(pair[:2]) for pair in pairs]
+        return job
+
+    job["file"] = review_path(request["file"], root)
+    for option, valid in JOB_OPTIONS.items():
+        value = request.get(option)
+        if value is None:
+            continue
+        if not valid(value):
+            raise ValueError(f"Invalid {option}: {value!r}")
+        job[option] = value
+    return job
+
+
+def review_pairs(pairs, answer, chunk_size: int):
+    """Review segment pairs, yielding the answer to each one."""
+    findings = 0
+    for idx, (english, catalan), res in pipeline.review(pairs, answer, chunk_size):
+        flagged = res.upper().startswith("YES")
+        findings += flagged
+        yield {"idx": idx, "english": english, "catalan": catalan, "result": str(res), "flagged": flagged}
+    return {"strings": len(pairs), "findings": findings}
+
+
+# -------------------------
+# Jobs
+# -------------------------
+class Job:
+    """A review request and the queue of events streamed back to its client."""
+
+    def __init__(self, request: dict):
+        self.request = request
+        self.priority = request["priority"]
+        self.events = queue.Queue()
+        self.cancelled = False
+        self.steps = None
+        self.reviewed = 0
+
+    def send(self, event: str, **fields):
+        self.events.put({"event": event, **fields})
+
+
+class Scheduler:
+    """Run the jobs one string at a time on the thread that owns the model.
+
+    The model, the verdict cache and the rest of the answerer are created
+    by that thread once, at start. Jobs with a higher priority run first,
+    and a running job yields to a more urgent one between strings, so a
+    single segment does not wait for a large file to finish. A file has
+    one job at a time, as its outputs are written next to it.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.ready = threading.Event()
+        self.started = time.time()
+        self.reviewed = 0
+        self.error = None
+        self.pool = self.cache = None
+        self.files = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, job: Job):
+        path = job.request.get("file")
+        if path:
+            with self.lock:
+                if path in self.files:
+                    raise FileExistsError(f"{path} is already queued or being reviewed")
+                self.files.add(path)
+        self.queue.put((-job.priority, next(self.order), job))
+        job.send("queued", position=self.queue.qsize(), ready=self.ready.is_set())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready.is_set(),
+            "error": self.error,
+            "queued": self.queue.qsize(),
+            "reviewed": self.reviewed,
+            "prompt_version": self.args.prompt_version,
+            "uptime": round(time.time() - self.started),
+        }
+
+    def close(self):
+        self.queue.put((float("inf"), next(self.order), None))
+        self.thread.join()
+
+    def _load(self):
+        args = self.args
+        self.prompt = inference.load_prompt(args.prompt_version)
+        self.pool = llm = None
+        if args.workers > 1:
+            from sharding import WorkerPool
+
+            self.pool = WorkerPool(
+                args.workers,
+                functools.partial(inference.load_review_llm, args.model_path, args),
+                self.prompt,
+                inference.translate,
+                cpu_set_spec=args.cpu_sets,
+                threads=args.threads,
+            )
+        else:
+            llm = inference.load_review_llm(args.model_path, args, n_threads=args.threads)
+        self.answer, self.chunk_size, self.namespace, self.cache, _ = inference.build_answerer(
+            args, self.prompt, llm, self.pool
+        )
+        self.dedup = Deduplicator(near=args.dedup == "near") if args.dedup else None
+        self.glossary = inference.build_glossary(args, llm) if args.context_tokens > 0 else None
+        self.ready.set()
+        print(f"Model loaded, serving prompt version {args.prompt_version}")
+
+    def _start(self, job: Job):
+        request = job.request
+        if "pairs" in request:
+            return review_pairs(request["pairs"], self.answer, self.chunk_size)
+        args = copy.copy(self.args)
+        for option in JOB_OPTIONS:
+            if option in request:
+                setattr(args, option, request[option])
+        return inference.iter_review_file(
+            request["file"], args, self.answer, self.chunk_size, self.namespace, self.dedup, self.glossary
+        )
+
+    def _release(self, job: Job):
+        with self.lock:
+            self.files.discard(job.request.get("file"))
+
+    def _more_urgent(self, job: Job) -> bool:
+        with self.queue.mutex:
+            return bool(self.queue.queue) and self.queue.queue[0][0] < -job.priority
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as e:
+            logging.exception("Model could not be loaded")
+            self.error = f"Model could not be loaded: {e}"
+        while True:
+            _, order, job = self.queue.get()
+            if job is None:
+                break
+            if self.error:
+                self._release(job)
+                job.send("error", message=self.error)
+                continue
+            requeued = False
+            try:
+                if job.steps is None and not job.cancelled:
+                    job.steps = self._start(job)
+                    job.send("started")
+                while not job.cancelled:
+                    result = next(job.steps)
+                    self.reviewed += 1
+                    job.reviewed += 1
+                    if result is not None:
+                        job.send("result", **result)
+                    if self._more_urgent(job):
+                        # Back to the queue with its place among its priority
+                        self.queue.put((-job.priority, order, job))
+                        requeued = True
+                        break
+                else:
+                    if job.steps is not None:
+                        # Runs the cleanup of the file: journal, manifest, annotated copy
+                        job.steps.close()
+                    logging.info("Job cancelled after %d strings", job.reviewed)
+            except StopIteration as done:
+                job.send("done", summary=done.value)
+            except Exception as e:
+                logging.exception("Job failed")
+                job.send("error", message=str(e))
+            finally:
+                if not requeued:
+                    self._release(job)
+        if self.pool:
+            self.pool.close()
+        if self.cache:
+            self.cache.close()
+
+
+# -------------------------
+# HTTP API
+# -------------------------
+class ReviewHandler(BaseHTTPRequestHandler):
+    """POST /review streams the events of a job as JSON lines; GET /status.
+
+    Only application/json requests are accepted, so a web page cannot post
+    jobs as a simple cross-site request, and files must be under `root`.
+    """
+
+    scheduler = None
+    root = None
+
+    def _send_json(self, code: int, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send_json(200, self.scheduler.status())
+
+    def do_POST(self):
+        if self.path != "/review":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(415, {"error": "Jobs are sent as application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = parse_job(json.loads(self.rfile.read(length)), self.root)
+        except PermissionError as e:
+            self._send_json(403, {"error": str(e)})
+            return
+        except FileNotFoundError as e:
+            self._send_json(404, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        job = Job(request)
+        try:
+            self.scheduler.submit(job)
+        except FileExistsError as e:
+            self._send_json(409, {"error": str(e)})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        while True:
+            try:
+                event = job.events.get(timeout=HEARTBEAT)
+            except queue.Empty:
+                # A job without findings sends nothing: the progress events
+                # find out whether the client is still there
+                event = {"event": "progress", "reviewed": job.reviewed}
+            try:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                # The client went away, stop reviewing for it
+                job.cancelled = True
+                return
+            if event["event"] in ("done", "error"):
+                return
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+def get_args():
+    parser = inference.build_parser(input_required=False)
+    parser.description = "Keep the review model loaded and review PO files or segments sent by client.py."
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument(
+        "--root",
+        default=".",
+        help="Only review PO files under this directory, where the outputs are written",
+    )
+    return parser.parse_args()
+
+
+# -------------------------
+# Main
+# -------------------------
+if __name__ == "__main__":
+    args = get_args()
+    if args.manifest:
+        raise SystemExit("--manifest is for a single file, every file job uses the manifest next to it")
+    if args.verdict_first and args.batch_size > 1:
+        print("--verdict_first answers one string per request, ignoring --batch_size")
+        args.batch_size = 1
+    if args.workers > 1 and args.batch_size > 1:
+        raise SystemExit("--workers reviews one string per request, it cannot be used with --batch_size")
+
+    ReviewHandler.scheduler = Scheduler(args)
+    ReviewHandler.root = os.path.realpath(args.root)
+    server = ThreadingHTTPServer((args.host, args.port), ReviewHandler)
+    server.daemon_threads = True
+    print(f"Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    ReviewHandler.scheduler.close()
@@ -0,0 +1,158 @@
+import functools
+import multiprocessing
+import os
+import time
+
+from verdict_cache import llm_params
+
+# State of the model loaded in each worker process
+_worker = {}
+
+
+# -------------------------
+# CPU sets
+# -------------------------
+def _parse_cpu_list(text: str):
+    cores = set()
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cores.update(range(int(first), int(last) + 1))
+        elif part:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def numa_cpu_sets():
+    """Cores of every NUMA node, or one set with all the cores without NUMA."""
+    nodes = []
+    base = "/sys/devices/system/node"
+    if not os.path.isdir(base):
+        return [sorted(os.sched_getaffinity(0))]
+    for name in sorted(os.listdir(base)):
+        if name.startswith("node") and name[4:].isdigit():
+            with open(os.path.join(base, name, "cpulist"), "r") as fh:
+                nodes.append(_parse_cpu_list(fh.read()))
+    return nodes
+
+
+def cpu_sets(spec: str, workers: int):
+    """Core sets for the workers.
+
+    `spec` is "numa" to use one NUMA node per worker, a ';' separated list of
+    core lists such as "0-15;16-31", or None to split the available cores in
+    contiguous groups.
+    """
+    if spec == "numa":
+        return numa_cpu_sets()
+    if spec:
+        return [_parse_cpu_list(cores) for cores in spec.split(";")]
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < workers:
+        return None
+    size = len(cores) // workers
+    return [cores[i * size : (i + 1) * size] for i in range(workers)]
+
+
+# -------------------------
+# Worker process
+# -------------------------
+def _init_worker(counter, load_llm, prompt, translate, sets, threads, own_copy):
+    with counter.get_lock():
+        number = counter.value
+        counter.value += 1
+    cores = sets[number % len(sets)] if sets else None
+    if cores:
+        os.sched_setaffinity(0, cores)
+    # Read after pinning, the weights are allocated in the memory of its node
+    kwargs = {"use_mmap": False} if own_copy else {}
+    llm = load_llm(n_threads=threads or (len(cores) if cores else None), **kwargs)
+    _worker.update(
+        number=number, llm=llm, prompt=prompt, translate=translate, cores=cores
+    )
+    print(f"Worker {number} (pid {os.getpid()}) loaded the model on cores {cores}")
+
+
+def _review_pair(task):
+    prompt, pair = task
+    start = time.time()
+    answer = _worker["translate"](_worker["llm"], prompt or _worker["prompt"], *pair)
+    return _worker["number"], answer, time.time() - start
+
+
+def _worker_params(_):
+    return llm_params(_worker["llm"])
+
+
+# -------------------------
+# Worker pool
+# -------------------------
+class WorkerPool:
+    """K processes that each load the model.
+
+    The GGUF file is memory mapped, so the workers share one copy of the
+    weights in the page cache. With `cpu_set_spec` "numa" every worker is
+    pinned to a node and reads its own copy of the weights (no mmap) into
+    the memory of that node, which needs K times the memory of the model.
+    Without NUMA nodes they all share the mapped weights and every core.
+
+    Pairs are handed out one at a time to the first free worker and answers
+    are returned in input order. `answerer` reviews with another prompt than
+    the one given at start up, so the loaded models can be reused.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        load_llm,
+        prompt: str,
+        translate,
+        cpu_set_spec: str = None,
+        threads: int = None,
+    ):
+        context = multiprocessing.get_context("fork")
+        counter = context.Value("i", 0)
+        sets = cpu_sets(cpu_set_spec, workers)
+        own_copy = cpu_set_spec == "numa" and len(sets) > 1
+        self.pool = context.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(counter, load_llm, prompt, translate, sets, threads, own_copy),
+        )
+        self.workers = workers
+        self.strings = [0] * workers
+        self.seconds = [0.0] * workers
+
+    def answer(self, pairs, prompt: str = None):
+        answers = []
+        tasks = [(prompt, pair) for pair in pairs]
+        for number, answer, seconds in self.pool.imap(_review_pair, tasks):
+            self.strings[number] += 1
+            self.seconds[number] += seconds
+            answers.append(answer)
+        return answers
+
+    def answerer(self, prompt: str):
+        return functools.partial(self.answer, prompt=prompt)
+
+    def params(self) -> dict:
+        return self.pool.map(_worker_params, [None])[0]
+
+    def report(self) -> dict:
+        throughput = {}
+        for number in range(self.workers):
+            seconds = self.seconds[number]
+            spm = (self.strings[number] / seconds * 60) if seconds else 0
+            throughput[f"worker_{number}"] = round(spm, 2)
+            print(
+                f"Worker {number}: {self.strings[number]} strings in {seconds:.2f}s | set/min: {spm:.2f}"
+            )
+        return throughput
+
+    def reset(self):
+        self.strings = [0] * self.workers
+        self.seconds = [0.0] * self.workers
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,98 @@
+import argparse
+import json
+from pathlib import Path
+
+
+def load_scores(path: Path) -> list[dict]:
+    """Records of a scores file written by evaluator.py --scores."""
+    if not path.is_file():
+        raise FileNotFoundError(f"File not found: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score_of(record: dict) -> float:
+    """p(YES), or 1/0 from the verdict for answers without logprobs.
+
+    Answers that are neither YES nor NO count as flagged, like in the
+    evaluator.
+    """
+    if record["p_yes"] is not None:
+        return record["p_yes"]
+    return 0.0 if record["verdict"] == "NO" else 1.0
+
+
+def metrics_at(records: list[dict], threshold: float) -> dict:
+    tp = fp = fn = tn = 0
+    for record in records:
+        flagged = score_of(record) >= threshold
+        if record["expected"]:
+            tp += flagged
+            fn += not flagged
+        else:
+            fp += flagged
+            tn += not flagged
+    precision = tp / (tp + fp) if (tp + fp) else 0
+    recall = tp / (tp + fn) if (tp + fn) else 0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
+    return {
+        "threshold": round(threshold, 4),
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "tn": tn,
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(f1, 3),
+    }
+
+
+def sweep(records: list[dict], step: float) -> list[dict]:
+    steps = round(1 / step)
+    return [metrics_at(records, i * step) for i in range(1, steps + 1)]
+
+
+def build_md_table(rows: list[dict]) -> str:
+    headers = list(rows[0])
+    lines = [
+        "| " + " | ".join(headers) + " |",
+        "| " + " | ".join(["---"] * len(headers)) + " |",
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(str(row[h]) for h in headers) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precision, recall and F1 of a scored run at different p(YES) thresholds."
+    )
+    parser.add_argument("scores", type=Path, help="output/scores-*.jsonl file")
+    parser.add_argument("--step", type=float, default=0.05, help="Distance between thresholds")
+    parser.add_argument("--threshold", type=float, help="Only report this threshold")
+    parser.add_argument("--output", type=Path, help="Also write the table as Markdown to this file")
+    args = parser.parse_args()
+
+    records = load_scores(args.scores)
+    scored = sum(record["p_yes"] is not None for record in records)
+    print(f"{len(records)} strings, {scored} with p(YES)")
+    if args.threshold is not None:
+        rows = [metrics_at(records, args.threshold)]
+    else:
+        rows = sweep(records, args.step)
+
+    table = build_md_table(rows)
+    print(table)
+    best = max(rows, key=lambda row: row["f1"])
+    print(
+        f"Best F1 {best['f1']} at threshold {best['threshold']} "
+        f"(precision {best['precision']}, recall {best['recall']})"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+        print(f"Markdown table written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import math
+import time
+
+from confidence import p_yes
+
+
+class TracedAnswer(str):
+    """Model answer that carries the measurements of the call that produced it.
+
+    `trace` holds the timings and token counts, `p_yes` the probability of
+    YES computed from the token logprobs.
+    """
+
+    def __new__(cls, answer: str, trace: dict = None, p_yes: float = None):
+        obj = super().__new__(cls, answer)
+        obj.trace = trace
+        obj.p_yes = p_yes
+        return obj
+
+
+def scored(answer: str, p_yes: float = None):
+    """The answer with its p(YES), e.g. when read back from a cache."""
+    return TracedAnswer(answer, p_yes=p_yes) if p_yes is not None else answer
+
+
+def traced_answer(answer: str, ai_msg):
+    """Attach the trace stored by TracedLlm and the p(YES) of `ai_msg` to the answer."""
+    metadata = getattr(ai_msg, "response_metadata", None) or {}
+    score = p_yes(metadata.get("logprobs"))
+    if "trace" not in metadata and score is None:
+        return answer
+    trace = None
+    if "trace" in metadata:
+        trace = dict(metadata["trace"], retries=metadata.get("retries", 0))
+    return TracedAnswer(answer, trace, score)
+
+
+def _usage(ai_msg, client=None):
+    """Prompt and completion tokens reported by the provider, or counted by llama.cpp."""
+    usage = getattr(ai_msg, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    if client is not None:
+        text = (ai_msg.content or "").encode("utf-8")
+        completion = len(client.tokenize(text, add_bos=False, special=True))
+        # After a call the context holds the prompt and the generated tokens
+        return max(0, client.n_tokens - completion), completion
+    return None, None
+
+
+# -------------------------
+# Traced model
+# -------------------------
+class TracedLlm:
+    """Wrap a model to measure every call.
+
+    Wall time, time to first token, prompt and completion tokens and
+    tokens/sec are stored in `response_metadata["trace"]` of the answer.
+    Time to first token is only known for models that stream (LangChain
+    models, not wrappers such as PrefixCachedLlm). `client` is the llama.cpp
+    model used to count tokens when the backend does not report them.
+    """
+
+    def __init__(self, llm, client=None):
+        self.llm = llm
+        self.client = client
+        self.streams = callable(getattr(type(llm), "stream", None))
+        # OpenAI only reports the usage of streamed answers when asked
+        fields = getattr(type(llm), "model_fields", {})
+        self.stream_kwargs = {"stream_usage": True} if "stream_usage" in fields else {}
+
+    def _trace(self, ai_msg, start: float, first_token: float = None):
+        wall = time.time() - start
+        ttft = first_token - start if first_token else None
+        prompt_tokens, completion_tokens = _usage(ai_msg, self.client)
+        decoding = wall - (ttft or 0)
+        tokens_per_sec = (
+            completion_tokens / decoding if completion_tokens and decoding > 0 else None
+        )
+        ai_msg.response_metadata["trace"] = {
+            "wall": round(wall, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_sec": round(tokens_per_sec, 2) if tokens_per_sec else None,
+        }
+        return ai_msg
+
+    def invoke(self, messages, **kwargs):
+        start = time.time()
+        if not self.streams:
+            return self._trace(self.llm.invoke(messages, **kwargs), start)
+
+        ai_msg = first_token = None
+        for chunk in self.llm.stream(messages, **self.stream_kwargs, **kwargs):
+            if first_token is None and chunk.content:
+                first_token = time.time()
+            ai_msg = chunk if ai_msg is None else ai_msg + chunk
+        return self._trace(ai_msg, start, first_token)
+
+    async def ainvoke(self, messages, **kwargs):
+        start = time.time()
+        if not self.streams:
+            return self._trace(await self.llm.ainvoke(messages, **kwargs), start)
+
+        ai_msg = first_token = None
+        async for chunk in self.llm.astream(messages, **self.stream_kwargs, **kwargs):
+            if first_token is None and chunk.content:
+                first_token = time.time()
+            ai_msg = chunk if ai_msg is None else ai_msg + chunk
+        return self._trace(ai_msg, start, first_token)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+# -------------------------
+# Trace file
+# -------------------------
+def percentile(values, pct: float):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class Trace:
+    """JSON lines file with one record per model call, plus its summary."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fh = open(path, "w", encoding="utf-8")
+        self.records = []
+
+    def record(self, idx: int, answer):
+        trace = getattr(answer, "trace", None)
+        if trace is None:
+            # Answered by a cache, the prefilter or a batch request
+            return
+        record = {"idx": idx, **trace}
+        self.records.append(record)
+        self.fh.write(json.dumps(record) + "\n")
+
+    def _values(self, field: str):
+        return [r[field] for r in self.records if r.get(field) is not None]
+
+    def summary(self) -> dict:
+        walls = self._values("wall")
+        ttfts = self._values("ttft")
+        completion = sum(self._values("completion_tokens"))
+        decoding = sum(r["wall"] - (r.get("ttft") or 0) for r in self.records)
+        stats = {
+            "traced_calls": len(self.records),
+            "latency_p50": percentile(walls, 50),
+            "latency_p95": percentile(walls, 95),
+            "latency_p99": percentile(walls, 99),
+            "ttft_p50": percentile(ttfts, 50),
+            "prompt_tokens": sum(self._values("prompt_tokens")),
+            "completion_tokens": completion,
+            "tokens_per_sec": round(completion / decoding, 2) if decoding > 0 else None,
+            "retries": sum(self._values("retries")),
+        }
+        return {key: value for key, value in stats.items() if value is not None}
+
+    def progress(self) -> str:
+        stats = self.summary()
+        if not stats["traced_calls"]:
+            # Every answer came from the cache, journal or pre-filter
+            return "Trace: 0 calls"
+        return (
+            f"Trace: {stats['traced_calls']} calls | latency p50/p95/p99: "
+            f"{stats.get('latency_p50')}/{stats.get('latency_p95')}/{stats.get('latency_p99')}s | "
+            f"tokens: {stats['prompt_tokens']} prompt, {stats['completion_tokens']} completion"
+        )
+
+    def close(self):
+        self.fh.close()
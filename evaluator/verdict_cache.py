@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import unicodedata
+
+from tracing import scored
+
+DEFAULT_PATH = ".cache/verdicts.db"
+# Seconds to wait for the write of another process before giving up
+TIMEOUT = 10
+
+# Attributes of the LangChain models that change the generated answer
+GENERATION_PARAMS = [
+    "model",
+    "model_name",
+    "temperature",
+    "top_p",
+    "top_k",
+    "max_tokens",
+    "max_output_tokens",
+    "repeat_penalty",
+    "n_ctx",
+]
+
+
+def llm_params(llm) -> dict:
+    """Generation parameters of a model, including the ones bound with .bind()."""
+    bound = getattr(llm, "bound", None)
+    if bound is not None:
+        params = llm_params(bound)
+        for name, value in llm.kwargs.items():
+            simple = isinstance(value, (str, int, float, bool))
+            params[name] = value if simple else type(value).__name__
+        return params
+
+    params = {}
+    for name in GENERATION_PARAMS:
+        value = getattr(llm, name, None)
+        if isinstance(value, (str, int, float, bool)):
+            params[name] = value
+    return params
+
+
+def _hash(value) -> str:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text).strip()
+
+
+# -------------------------
+# Verdict cache
+# -------------------------
+class VerdictCache:
+    """SQLite store of model answers keyed by model, prompt and segment.
+
+    When the stored answers exceed `max_size_mb` the least recently used
+    ones are evicted. Several processes can share the cache: lookups only
+    read, the use of the hits is written with the next answer stored, and a
+    database locked by another process is a miss.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_size_mb: float = 512):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=TIMEOUT)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL, p_yes REAL)"
+        )
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(verdicts)")]
+        if "p_yes" not in columns:
+            self.db.execute("ALTER TABLE verdicts ADD COLUMN p_yes REAL")
+        self.db.commit()
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = self.misses = 0
+        # Last use of the hits, written by put() and close()
+        self.used = {}
+
+    @staticmethod
+    def namespace(model: str, model_path: str, prompt: str, params: dict, mode: str = "single") -> str:
+        """Key prefix of the answers of a model, prompt and review `mode` (see batching.review_mode)."""
+        return _hash([model, model_path or "", prompt, params, mode])
+
+    @staticmethod
+    def key(namespace: str, pair) -> str:
+        return _hash([namespace, [normalize(text) for text in pair]])
+
+    def get(self, key: str):
+        try:
+            row = self.db.execute(
+                "SELECT answer, p_yes FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[key] = time.time()
+        return scored(*row)
+
+    def _write(self, *statements):
+        """Run the statements and the pending last uses in one transaction."""
+        try:
+            self.db.executemany(
+                "UPDATE verdicts SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self.used.items()],
+            )
+            for sql, values in statements:
+                self.db.execute(sql, values)
+            self.db.commit()
+        except sqlite3.OperationalError as e:
+            self.db.rollback()
+            print(f"Verdict cache: could not write, {e}")
+            return False
+        self.used.clear()
+        return True
+
+    def put(self, key: str, answer: str):
+        self._write(
+            (
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    answer,
+                    len(key) + len(answer.encode("utf-8")),
+                    time.time(),
+                    getattr(answer, "p_yes", None),
+                ),
+            )
+        )
+
+    def evict(self):
+        (size,) = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM verdicts").fetchone()
+        if size <= self.max_size:
+            return 0
+        removed = 0
+        rows = self.db.execute("SELECT key, size FROM verdicts ORDER BY last_used")
+        for key, entry_size in rows.fetchall():
+            if size <= self.max_size * 0.9:
+                break
+            self.db.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+            size -= entry_size
+            removed += 1
+        self.db.commit()
+        print(f"Verdict cache: evicted {removed} entries")
+        return removed
+
+    def stats(self) -> dict:
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+    def progress(self) -> str:
+        return f"Cache hits: {self.hits}, misses: {self.misses}"
+
+    def close(self):
+        if self._write():
+            try:
+                self.evict()
+            except sqlite3.OperationalError as e:
+                self.db.rollback()
+                print(f"Verdict cache: could not evict, {e}")
+        self.db.close()
+
+
+def cached_answerer(answer, cache: VerdictCache, namespace: str):
+    """Look up every pair in the cache and only ask `answer` for the misses."""
+
+    def cached(pairs):
+        keys = [cache.key(namespace, pair) for pair in pairs]
+        answers = [cache.get(key) for key in keys]
+        missing = [i for i, res in enumerate(answers) if res is None]
+        if missing:
+            fresh = answer([pairs[i] for i in missing])
+            for i, res in zip(missing, fresh):
+                answers[i] = res
+                cache.put(keys[i], res)
+        return answers
+
+    return cached
@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+import polib
+
+EXTENSIONS = {"txt": ".txt", "jsonl": ".jsonl", "po": ".review.po"}
+PO_HEADER = 'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n'
+
+
+def output_path(path: str, output_format: str) -> str:
+    return os.path.splitext(path)[0] + EXTENSIONS[output_format]
+
+
+def check_output(path: str, input_path: str) -> str:
+    """Return `path`, refusing to write over the file being reviewed."""
+    if os.path.realpath(path) == os.path.realpath(input_path):
+        raise ValueError(f"Refusing to write over the input file {input_path}")
+    return path
+
+
+# -------------------------
+# Formats
+# -------------------------
+def format_txt(english, catalan, note, result, status=None) -> str:
+    lines = [
+        f"English: {english}",
+        f"Catalan: {catalan}",
+    ]
+    if note:
+        lines.append(f"Note: {note}")
+    lines.append(f"Result: {result}")
+    if status:
+        lines.append(f"Status: {status}")
+    lines.append("\n-----------------------\n")
+    return "\n".join(lines) + "\n"
+
+
+def format_jsonl(english, catalan, note, result, status=None) -> str:
+    finding = {"english": english, "catalan": catalan, "note": note, "result": result}
+    if status:
+        finding["status"] = status
+    return json.dumps(finding, ensure_ascii=False) + "\n"
+
+
+def format_po(english, catalan, note, result, status=None) -> str:
+    """The reviewed entry with the answer as translator comment."""
+    comment = f"Review: {result}" + (f"\nStatus: {status}" if status else "")
+    entry = polib.POEntry(msgid=english, msgstr=catalan, comment=note or "", tcomment=comment)
+    return str(entry) + "\n"
+
+
+FORMATTERS = {"txt": format_txt, "jsonl": format_jsonl, "po": format_po}
+
+
+# -------------------------
+# Background writer
+# -------------------------
+class ResultWriter:
+    """Write findings to disk and to the console from a background thread.
+
+    `write` only puts the finding in a bounded queue, so the review loop does
+    not wait for the disk or the terminal unless the writer falls
+    `queue_size` findings behind. The file is flushed every `flush_every`
+    findings and whenever the queue is empty. If the thread fails, the
+    next `write` or `close` raises its error instead of waiting for it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        output_format: str = "txt",
+        quiet: bool = False,
+        queue_size: int = 1024,
+        flush_every: int = 64,
+    ):
+        self.path = path
+        self.format = FORMATTERS[output_format]
+        self.quiet = quiet
+        self.flush_every = flush_every
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.fh = open(path, "w", encoding="utf-8")
+        if output_format == "po":
+            self.fh.write(PO_HEADER)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, english, catalan, note, result, status=None):
+        self._put((english, catalan, note, result, status))
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError(f"Writing the findings to {self.path} failed") from self.error
+
+    def _put(self, item):
+        # A full queue is only waited for while the thread is working
+        while True:
+            self._check()
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self):
+        pending = 0
+        try:
+            while True:
+                finding = self.queue.get()
+                if finding is None:
+                    break
+                self.fh.write(self.format(*finding))
+                if not self.quiet:
+                    print(format_txt(*finding), end="")
+                pending += 1
+                if pending >= self.flush_every or self.queue.empty():
+                    self.fh.flush()
+                    pending = 0
+        except Exception as e:
+            self.error = e
+        finally:
+            self.fh.close()
+
+    def close(self):
+        if self.thread.is_alive():
+            self._put(None)
+            self.thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def log_in_background(filename: str, level=logging.INFO):
+    """Send the log records to `filename` from a background thread.
+
+    Processes forked later (the workers) log to the file directly, as the
+    thread that empties the queue only exists in the parent.
+    """
+    log_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    handler = logging.FileHandler(filename, mode="w", encoding="utf-8")
+    handler.setFormatter(log_format)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logging.basicConfig(level=level, handlers=[logging.handlers.QueueHandler(log_queue)])
+
+    def direct_handler():
+        child_handler = logging.FileHandler(filename, mode="a", encoding="utf-8")
+        child_handler.setFormatter(log_format)
+        logging.getLogger().handlers = [child_handler]
+
+    os.register_at_fork(after_in_child=direct_handler)
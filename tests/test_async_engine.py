@@ -0,0 +1,35 @@
+from async_engine import is_retryable
+from fake_llm import RateLimitError
+
+
+class HttpError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+def test_retryable_status():
+    assert is_retryable(RateLimitError("429 Too Many Requests"))
+    assert is_retryable(HttpError(503))
+    assert not is_retryable(HttpError(400))
+    assert not is_retryable(HttpError(404))
+
+
+def test_retryable_type_and_cause():
+    assert is_retryable(ServiceUnavailable("try later"))
+    try:
+        try:
+            raise ServiceUnavailable("try later")
+        except ServiceUnavailable as e:
+            raise ValueError("Error calling the model") from e
+    except ValueError as wrapped:
+        assert is_retryable(wrapped)
+
+
+def test_numbers_in_the_message_are_not_retried():
+    assert not is_retryable(ValueError("Invalid max_tokens: 500"))
+    assert not is_retryable(KeyError("rate limit"))
@@ -0,0 +1,25 @@
+from batching import parse_batch_answer
+
+
+def test_parse_batch_answer_formats():
+    answer = """1: YES - the placeholder is missing
+**2.** NO
+- Translation 3) yes: wrong term
+Segment 4 - no - fine
+"""
+    assert parse_batch_answer(answer, 4) == [
+        "YES - the placeholder is missing",
+        "NO",
+        "YES - wrong term",
+        "NO - fine",
+    ]
+
+
+def test_parse_batch_answer_missing_and_out_of_range():
+    answer = "1: NO\n3: YES - typo\n7: YES - not in the batch\n1: YES - repeated"
+    assert parse_batch_answer(answer, 3) == ["NO", None, "YES - typo"]
+
+
+def test_parse_batch_answer_skips_thinking():
+    answer = "<think>\n1: YES - maybe\n</think>\n1: NO\n2: NO"
+    assert parse_batch_answer(answer, 2) == ["NO", "NO"]
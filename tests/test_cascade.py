@@ -0,0 +1,34 @@
+from cascade import Cascade, Stage
+from tracing import scored
+
+SCREEN = {
+    "Open": scored("NO", 0.05),
+    "Save": scored("NO", 0.4),
+    "Quit": scored("YES - typo", 0.6),
+    "Close": scored("YES - term", 0.97),
+    "Help": "NO",
+}
+
+
+def cascade(escalated, **thresholds):
+    def screen(pairs):
+        return [SCREEN[english] for english, _ in pairs]
+
+    def escalate(pairs):
+        escalated.extend(english for english, _ in pairs)
+        return ["NO - checked" for _ in pairs]
+
+    return Cascade(Stage("screen", screen, ""), Stage("main", escalate, ""), **thresholds).answerer()
+
+
+def test_cascade_escalates_by_verdict():
+    escalated = []
+    cascade(escalated)([(english, "") for english in SCREEN])
+    assert escalated == ["Quit", "Close"]
+
+
+def test_cascade_escalates_by_p_yes():
+    escalated = []
+    answers = cascade(escalated, low=0.2, high=0.8)([(english, "") for english in SCREEN])
+    assert escalated == ["Save", "Quit"]
+    assert answers == ["NO", "NO - checked", "NO - checked", "YES - term", "NO"]
@@ -0,0 +1,46 @@
+from journal import Journal
+from tracing import scored
+from verdict_cache import cached_answerer
+
+
+def answerer(calls):
+    def answer(pairs):
+        calls.extend(pairs)
+        return [scored(f"YES - {english}", 0.9) for english, _ in pairs]
+
+    return answer
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / "run.journal")
+    pairs = [("Open", "Obre"), ("Open", "Obre"), ("Save", "Desa")]
+    calls = []
+    journal = Journal(path, "signature")
+    answer = cached_answerer(answerer(calls), journal, "signature")
+    answer(pairs[:2])
+    journal.save_checkpoint(processed=2, elapsed=1.5)
+    journal.close()
+    # A crash in the middle of a record
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"key": "cut')
+
+    journal = Journal(path, "signature", resume=True)
+    assert journal.elapsed() == 1.5
+    answer = cached_answerer(answerer(calls), journal, "signature")
+    answers = answer(pairs)
+    assert answers == ["YES - Open", "YES - Open", "YES - Save"]
+    assert answers[0].p_yes == 0.9
+    assert calls == [("Open", "Obre"), ("Open", "Obre"), ("Save", "Desa")]
+    journal.close()
+
+def test_journal_other_signature_starts_again(tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = Journal(path, "signature")
+    cached_answerer(answerer([]), journal, "signature")([("Open", "Obre")])
+    journal.close()
+
+    calls = []
+    journal = Journal(path, "other", resume=True)
+    cached_answerer(answerer(calls), journal, "other")([("Open", "Obre")])
+    journal.close()
+    assert calls == [("Open", "Obre")]
@@ -0,0 +1,117 @@
+import os
+
+import polib
+import pytest
+
+import loaders
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dataset")
+
+FIELDS = [
+    "msgctxt",
+    "msgid",
+    "msgid_plural",
+    "msgstr",
+    "msgstr_plural",
+    "obsolete",
+    "flags",
+    "comment",
+    "tcomment",
+    "occurrences",
+    "previous_msgctxt",
+    "previous_msgid",
+    "previous_msgid_plural",
+]
+
+# Every construct of the PO format that iter_po parses by itself
+CATALOG = r'''# Catalan translation.
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+"Plural-Forms: nplurals=2; plural=n != 1;\n"
+
+#. Button label
+#: src/dialog.c:10 src/window.c:20
+msgctxt "button"
+msgid "_Open"
+msgstr "_Obre"
+
+#: src/dialog.c:12
+msgctxt "menu"
+msgid "_Open"
+msgstr "_Obre…"
+
+# A translator comment
+#, c-format
+msgid "%d file"
+msgid_plural "%d files"
+msgstr[0] "%d fitxer"
+msgstr[1] "%d fitxers"
+
+#, fuzzy, c-format
+#| msgid "Deleted %s"
+msgid "Removed %s"
+msgstr "S'ha suprimit %s"
+
+msgid ""
+"A long string that "
+"continues on the next line\twith \"quotes\"\n"
+msgstr ""
+"Una cadena llarga que "
+"continua a la línia següent\tamb «cometes»\n"
+
+#: data/app.desktop.in:3
+msgid "Untranslated"
+msgstr ""
+
+#~ msgid "Old string"
+#~ msgstr "Cadena antiga"
+
+#~ msgctxt "old"
+#~ msgid "Old plural"
+#~ msgid_plural "Old plurals"
+#~ msgstr[0] "Plural antic"
+#~ msgstr[1] "Plurals antics"
+'''
+
+
+def entries(parsed):
+    return [
+        {field: getattr(entry, field) for field in FIELDS}
+        for entry in parsed
+        if entry.msgid or entry.obsolete
+    ]
+
+
+def assert_same_as_polib(path):
+    expected = entries(polib.pofile(path))
+    assert entries(loaders.iter_po(path)) == expected
+    return expected
+
+
+def test_iter_po_constructs(tmp_path):
+    path = tmp_path / "catalog.po"
+    path.write_text(CATALOG, encoding="utf-8")
+    expected = assert_same_as_polib(str(path))
+
+    assert len(expected) == 8
+    assert [entry["msgctxt"] for entry in expected[:2]] == ["button", "menu"]
+    assert expected[2]["msgstr_plural"] == {0: "%d fitxer", 1: "%d fitxers"}
+    assert expected[3]["flags"] == ["fuzzy", "c-format"]
+    assert [entry["obsolete"] for entry in expected[6:]] == [True, True]
+
+
+def test_iter_po_header(tmp_path):
+    path = tmp_path / "catalog.po"
+    path.write_text(CATALOG, encoding="utf-8")
+    header = next(loaders.iter_po(str(path)))
+    assert header.msgid == ""
+    assert "Plural-Forms" in header.msgstr
+
+
+@pytest.mark.parametrize("name", ["dataset.po", "gnome-docs.po"])
+def test_iter_po_dataset(name):
+    path = os.path.join(DATASET, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not available")
+    assert assert_same_as_polib(path)
@@ -0,0 +1,20 @@
+import results_store
+from tracing import scored
+
+
+def test_results_store_compares_runs(tmp_path):
+    db = results_store.connect(str(tmp_path / "results.db"))
+    segments = [("Open", "Obre"), ("Save", "Desa"), ("Quit", "Surt")]
+    runs = []
+    for answers in (["YES - typo", "NO", "YES - term"], ["NO", "NO", "YES - term"]):
+        run = results_store.Run(db, "model", "1", flush_every=2)
+        for idx, ((source, target), answer) in enumerate(zip(segments, answers), start=1):
+            run.add(idx, source, target, True, scored(answer, 0.5))
+        run.finish({"f1": 0.5}, len(segments))
+        runs.append(run.run_id)
+
+    assert results_store.resolve_run(db, "model:1") == runs[1]
+    assert results_store.load_stats(db, 3) == [{"f1": 0.5}, {"f1": 0.5}]
+    assert results_store.disagreement(db, *runs) == (3, 1)
+    only = results_store.flagged_only_by(db, *runs)
+    assert [(idx, source, answer) for idx, source, _, _, answer in only] == [(1, "Open", "YES - typo")]
@@ -0,0 +1,57 @@
+from tracing import scored
+from verdict_cache import VerdictCache, cached_answerer
+
+
+def answerer(calls):
+    def answer(pairs):
+        calls.extend(pairs)
+        return [scored(f"YES - {english}", 0.9) for english, _ in pairs]
+
+    return answer
+
+
+def test_verdict_cache_reuses_answers(tmp_path):
+    namespace = VerdictCache.namespace("model", "model.gguf", "prompt", {"temperature": 0})
+    calls = []
+    cache = VerdictCache(str(tmp_path / "verdicts.db"))
+    answer = cached_answerer(answerer(calls), cache, namespace)
+    assert answer([("Open", "Obre"), ("Save", "Desa")]) == ["YES - Open", "YES - Save"]
+    cache.close()
+
+    cache = VerdictCache(str(tmp_path / "verdicts.db"))
+    answer = cached_answerer(answerer(calls), cache, namespace)
+    # NFC normalization and surrounding whitespace do not change the key
+    answers = answer([(" Open", "Obre"), ("Quit", "Surt")])
+    assert answers == ["YES - Open", "YES - Quit"]
+    assert answers[0].p_yes == 0.9
+    assert calls == [("Open", "Obre"), ("Save", "Desa"), ("Quit", "Surt")]
+    assert cache.stats() == {"cache_hits": 1, "cache_misses": 1}
+    cache.close()
+
+def test_verdict_cache_namespace_review_mode():
+    args = ("model", "model.gguf", "prompt", {"temperature": 0})
+    assert VerdictCache.namespace(*args) == VerdictCache.namespace(*args, "single")
+    assert VerdictCache.namespace(*args) != VerdictCache.namespace(*args, "batch")
+
+
+def test_verdict_cache_shared_by_processes(tmp_path, monkeypatch):
+    import verdict_cache
+
+    monkeypatch.setattr(verdict_cache, "TIMEOUT", 0.1)
+    path = str(tmp_path / "verdicts.db")
+    first = VerdictCache(path)
+    key = first.key("namespace", ("Open", "Obre"))
+    first.put(key, scored("NO", 0.1))
+    # A lookup leaves no transaction open that would lock out the others
+    assert first.get(key) == "NO"
+    other = VerdictCache(path)
+    other.put(other.key("namespace", ("Save", "Desa")), scored("NO", 0.1))
+
+    # While another process writes, a lookup still reads and a write is skipped
+    other.db.execute("BEGIN IMMEDIATE")
+    assert first.get(key) == "NO"
+    first.put(first.key("namespace", ("Quit", "Surt")), scored("NO", 0.1))
+    other.db.rollback()
+    assert first.get(first.key("namespace", ("Quit", "Surt"))) is None
+    first.close()
+    other.close()
@@ -0,0 +1,22 @@
+import pytest
+
+from writer import ResultWriter
+
+
+def test_writer_writes_findings(tmp_path):
+    path = tmp_path / "findings.jsonl"
+    with ResultWriter(str(path), "jsonl", quiet=True, queue_size=2) as writer:
+        for number in range(10):
+            writer.write(f"Open {number}", f"Obre {number}", "", "YES - typo")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 10
+
+
+def test_writer_error_does_not_block(tmp_path):
+    writer = ResultWriter(str(tmp_path / "findings.txt"), quiet=True, queue_size=2)
+    # Fails in the thread when the first finding is written
+    writer.format = None
+    with pytest.raises(RuntimeError, match="findings.txt failed"):
+        for number in range(100):
+            writer.write(f"Open {number}", f"Obre {number}", "", "YES - typo")
+    with pytest.raises(RuntimeError):
+        writer.close()